@@ -0,0 +1,248 @@
+import argparse
+import collections
+import email.utils
+import gzip as gz
+import hashlib
+import http.server
+import os
+import re
+import socket
+import threading
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+
+# Saved pages and synthetic instance files in the formats of the libraries, so that benchmarks run offline.
+# The server acts as the HTTP proxy of MIPLIBing (http_proxy), hence requests to the real hosts are
+# answered locally without changing any URL.
+
+# Saved copies of the instances pages and of qplib.solu, by host and path (see save_pages)
+PAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+SAVED = [("miplib.zib.de", "/tag_benchmark.html"), ("miplib.zib.de", "/tag_collection.html"), ("www.minlplib.org", "/instances.html"), ("qplib.zib.de", "/instances.html"), ("qplib.zib.de", "/qplib.solu")]
+
+RANGE = re.compile(r"bytes=(\d+)-(\d*)$")
+
+
+def saved_page(host, path):
+    # Content of the saved copy of a page, or None if there is none
+    file_path = os.path.join(PAGES, host, path.lstrip("/"))
+    if (host, path) not in SAVED or not os.path.isfile(file_path):
+        return None
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+def save_pages(directory = PAGES):
+    # Replaces the saved copies with the current pages of the libraries (needs internet access)
+    for host, path in SAVED:
+        file_path = os.path.join(directory, host, path.lstrip("/"))
+        os.makedirs(os.path.dirname(file_path), exist_ok = True)
+        with urllib.request.urlopen("http://" + host + path, timeout = 60) as response:
+            content = response.read()
+        with open(file_path, "wb") as f:
+            f.write(content)
+
+def table(head, rows):
+    out = ['<html><head><meta charset="utf-8"></head><body><table><thead><tr>']
+    out += ["<th>" + str(cell) + "</th>" for cell in head] + ["</tr></thead><tbody>"]
+    for row in rows:
+        out.append("<tr>" + "".join("<td>" + str(cell) + "</td>" for cell in row) + "</tr>")
+    out.append("</tbody></table></body></html>")
+    return "\n".join(out).encode("utf-8")
+
+
+def miplib_page(n):
+    head = ["Instance", "Status", "Variables", "Binaries", "Integers", "Continuous", "Constraints", "Nonz.", "Submitter", "Group", "Objective", "Tags"]
+    rows = []
+    for i in range(n):
+        status = ["easy", "hard", "open"][i % 3]
+        objective = str(i) + "*" if status == "open" else ("Infeasible" if i % 7 == 0 else str(float(i)))
+        tags = ["benchmark binary", "mixed_binary feasibility", "set_covering decomposition", "no_solution"][i % 4]
+        rows.append(["inst" + str(i), status, 10 + i, i, 10, 0, 5 + i % 100, 20 + i, "A. B", "group" + str(i % 10), objective, tags])
+    return table(head, rows)
+
+
+def minlplib_page(n):
+    head = ["Name", "Formats", "Type", "C", "#Vars", "#BinVars", "#IntVars", "#Cons", "#SOS", "#Semi", "#NZ", "S", "Dual Bound", "Primal Bound", "Points"]
+    rows = [["m" + str(i), "gms lp", ["QP", "MBNLP", "NLP"][i % 3], ["✔", "-", ""][i % 3], 10 + i, i % 5 or "", "", 3 + i % 100, "", "", 20 + i, ["✔", ""][i % 2], [-1.5, "inf", ""][i % 3], ["", 2.5 * i][i % 2], 1] for i in range(n)]
+    return table(head, rows)
+
+
+def qplib_page(n):
+    head = ["Instance", "Cvx", "O", "V", "C", "TotalVars.", "BinaryVars.", "IntegerVars.", "TotalCons.", "Quad.Cons.", "Non-zeros", "Q0density", "Q0probl.ev"]
+    rows = [["%04d (lp, qplib)" % i, ["-", "✔"][i % 2], "LQCD"[i % 4], "CBMIG"[i % 5], "NBLQ"[i % 4], 10 + i, i % 3 or "", "", 3 + i % 100, i % 4, 30 + i, 1.5 * (i % 60), 0.5] for i in range(n)]
+    rows.append(["Total"] + [""] * 12)
+    return table(head, rows)
+
+
+def qplib_solu(n):
+    return "".join("=best= QPLIB_%04d %g\n" % (i, i * 1.25) for i in range(0, n, 2)).encode()
+
+
+def mps_file(name, n):
+    # Model with n integer variables and n constraints, each column with three nonzeroes
+    lines = ["NAME " + name, "ROWS", " N obj"] + [" L c" + str(i) for i in range(n)]
+    lines += ["COLUMNS", "    MARKER  'MARKER'  'INTORG'"]
+    for j in range(n):
+        lines.append("    x%d obj %d c%d 1" % (j, j + 1, j))
+        lines.append("    x%d c%d -2.5 c%d 3" % (j, (j + 1) % n, (j + 7) % n))
+    lines += ["    MARKER  'MARKER'  'INTEND'", "RHS"] + ["    rhs c%d %d" % (i, i + 2) for i in range(n)]
+    lines += ["BOUNDS"] + [" UP bnd x%d 10" % j for j in range(n)] + ["ENDATA"]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def gms_file(name, n):
+    lines = ["* " + name, "Variables objvar, " + ", ".join("x" + str(j) for j in range(n)) + ";", "Equations e1;"]
+    lines += ["e1.. objvar =e= " + " + ".join(str(j + 1) + "*sqr(x" + str(j) + ")" for j in range(n)) + ";", "Model m / all /;", "Solve m using NLP minimizing objvar;"]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def qplib_file(name, n):
+    # Box-constrained binary QP with a tridiagonal Q0
+    lines = ["QPLIB_" + name, "QBN", "minimize", str(n), str(2 * n - 1)]
+    lines += ["%d %d 2.0" % (j + 1, j + 1) for j in range(n)] + ["%d %d -1.0" % (j + 2, j + 1) for j in range(n - 1)]
+    lines += ["0.0", str(n)] + ["%d %d" % (j + 1, j % 3) for j in range(n)]
+    lines += ["0.0", "1.0E+30", "0.0", "0", "0", "0"]
+    return ("\n".join(lines) + "\n").encode()
+
+
+class FixtureServer:
+    # Local stand-in for the sites of the libraries, with the saved pages (if rows is None) or synthetic catalogs
+    # of rows instances, and instance files of size variables, answering each request after latency seconds.
+    # Responses carry an ETag and a Last-Modified date, and conditional and Range requests are answered with
+    # 304 and 206 (or 200 if an If-Range validator does not match). The next cuts complete responses with a body longer than cut_after bytes are cut after that
+    # many bytes, after a pause of stall seconds, so as to exercise resumed downloads.
+
+    def __init__(self, rows = None, size = 100, latency = 0.0):
+        self.rows = rows
+        self.size = size
+        self.latency = latency
+        self.validators = True
+        self.cuts = 0
+        self.cut_after = 0
+        self.stall = 0.0
+        self.requests = collections.Counter() # By host
+        self.paths = collections.Counter() # By host and path
+        self.statuses = collections.Counter() # By status code
+        self.bytes_sent = 0
+        self.files = {}
+        self.modified = {}
+        self.lock = threading.Lock()
+        fixture = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                # Headers and body are sent separately, which must not wait for delayed acknowledgements
+                http.server.BaseHTTPRequestHandler.setup(self)
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                host = url.hostname or self.headers.get("Host", "")
+                body = fixture.content(host, url.path)
+                if fixture.latency:
+                    time.sleep(fixture.latency)
+
+                headers = {}
+                status = 200 if body is not None else 404
+                if body is not None and fixture.validators:
+                    modified = fixture.modified[(host, url.path, fixture.rows, fixture.size)]
+                    headers["ETag"] = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+                    headers["Last-Modified"] = email.utils.formatdate(modified, usegmt = True)
+                    if "If-None-Match" in self.headers: # Takes precedence over If-Modified-Since
+                        if headers["ETag"] in [tag.strip() for tag in self.headers["If-None-Match"].split(",")]:
+                            status = 304
+                    elif "If-Modified-Since" in self.headers:
+                        since = email.utils.parsedate_to_datetime(self.headers["If-Modified-Since"]).timestamp()
+                        if int(modified) <= since:
+                            status = 304
+                byte_range = RANGE.match(self.headers.get("Range", ""))
+                if "If-Range" in self.headers and self.headers["If-Range"] not in [headers.get("ETag"), headers.get("Last-Modified")]:
+                    byte_range = None # The file changed, so it is sent whole
+                if status == 200 and byte_range:
+                    start = int(byte_range.group(1))
+                    end = min(int(byte_range.group(2) or len(body) - 1), len(body) - 1)
+                    if start >= len(body):
+                        status = 416
+                        headers["Content-Range"] = "bytes */" + str(len(body))
+                    else:
+                        status = 206
+                        headers["Content-Range"] = "bytes " + str(start) + "-" + str(end) + "/" + str(len(body))
+                        body = body[start:end + 1]
+                if status not in [200, 206]:
+                    body = b""
+
+                cut = False
+                with fixture.lock:
+                    if fixture.cuts > 0 and status == 200 and len(body) > fixture.cut_after:
+                        fixture.cuts -= 1
+                        cut = True
+                    fixture.requests[url.hostname] += 1
+                    fixture.paths[(host, url.path)] += 1
+                    fixture.statuses[status] += 1
+                    fixture.bytes_sent += fixture.cut_after if cut else len(body)
+
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if cut: # The client sees the connection close before the end of the body
+                    self.wfile.write(body[:fixture.cut_after])
+                    self.wfile.flush()
+                    time.sleep(fixture.stall)
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+        self.thread.start()
+        self.url = "http://127.0.0.1:" + str(self.server.server_port)
+
+    def content(self, host, path):
+        # Body for a request to host and path, or None if there is no such resource
+        key = (host, path, self.rows, self.size)
+        if key in self.files:
+            return self.files[key]
+        name = path.rsplit("/", 1)[-1]
+        if self.rows is None and (host, path) in SAVED:
+            body = saved_page(host, path)
+        elif host == "miplib.zib.de" and path in ["/tag_benchmark.html", "/tag_collection.html"]:
+            body = miplib_page(self.rows)
+        elif host == "miplib.zib.de" and path.startswith("/WebData/instances/") and name.endswith(".mps.gz"):
+            body = gz.compress(mps_file(name[:-len(".mps.gz")], self.size), compresslevel = 6)
+        elif host == "www.minlplib.org" and path == "/instances.html":
+            body = minlplib_page(self.rows)
+        elif host == "www.minlplib.org" and path.startswith("/gms/"):
+            body = gms_file(name[:-len(".gms")], self.size)
+        elif host == "qplib.zib.de" and path == "/instances.html":
+            body = qplib_page(self.rows)
+        elif host == "qplib.zib.de" and path == "/qplib.solu":
+            body = qplib_solu(self.rows)
+        elif host == "qplib.zib.de" and path.startswith("/qplib/QPLIB_"):
+            body = qplib_file(name[len("QPLIB_"):-len(".qplib")], self.size)
+        else:
+            return None
+        with self.lock:
+            self.files[key] = body
+            self.modified[key] = time.time()
+        return body
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Saved copies of the instances pages of the libraries")
+    parser.add_argument("--save-pages", action = "store_true", help = "replace the saved copies with the current pages of the libraries")
+    if parser.parse_args().save_pages:
+        save_pages()
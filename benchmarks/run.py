@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmarks of MIPLIBing against a local stand-in of the sites of the libraries (see fixtures.py), which
+# print their results as JSON. Run from the repository with: python benchmarks/run.py [--quick] [--output FILE]
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(os.path.dirname(BENCHMARKS), "src")
+sys.path.insert(0, SOURCE)
+sys.path.insert(0, BENCHMARKS)
+
+from fixtures import FixtureServer
+
+
+def timed(function, repeat = 1, setup = None):
+    # Median and minimum wall time of repeat calls to function, in seconds. If setup is given, its result is
+    # the argument of function and it is not timed.
+    times = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        function(argument) if setup is not None else function()
+        times.append(time.perf_counter() - start)
+    return {"median": statistics.median(times), "min": min(times), "repeat": repeat}
+
+
+# Packages that should only be imported when they are needed (see MIPLIBing.lazy)
+HEAVY_MODULES = ["pandas", "numpy", "requests"]
+
+
+def run_fresh(code, repeat):
+    # Runs code in repeat fresh interpreters; code prints the seconds it took and the heavy modules it imported
+    code = "import time; start = time.perf_counter()\n" + code + "\nimport sys; print(time.perf_counter() - start, *[name for name in " + repr(HEAVY_MODULES) + " if name in sys.modules])"
+    env = dict(os.environ, PYTHONPATH = SOURCE + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], env = env, check = True, capture_output = True, text = True).stdout.split()
+        times.append(float(output[0]))
+    return {"median": statistics.median(times), "min": min(times), "repeat": repeat, "heavy_modules": output[1:]}
+
+
+def bench_import(repeat):
+    # Time to import the package in a fresh interpreter
+    return run_fresh("import MIPLIBing", repeat)
+
+
+def bench_startup(server, directory, repeat):
+    # Import, constructor, and lookup of one instance by name in a fresh interpreter, on a warm cache
+    from MIPLIBing import MIPLIBing, Libraries
+    server.rows = 100
+    local_directory = os.path.join(directory, "startup")
+    MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = local_directory).get_instances(instance_name = "inst7")
+    code = ("from MIPLIBing import MIPLIBing, Libraries\n" +
+            "instance, = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = " + repr(local_directory) + ").get_instances(instance_name = 'inst7')\n" +
+            "assert instance.path is not None")
+    result = run_fresh(code, repeat)
+    shutil.rmtree(local_directory, ignore_errors = True)
+    return result
+
+
+def bench_constructor(server, directory, rows, repeat):
+    # Constructor of each library, building the catalog from the pages (rebuild) or using the CSV file (warm),
+    # and first query on the catalog, parsing the CSV file (cold) or reading its binary copy (npz). The pages
+    # are the saved copies, or synthetic pages of rows instances.
+    from MIPLIBing import MIPLIBing, Libraries
+    server.rows = rows
+    results = {}
+    for library in Libraries:
+        local_directory = os.path.join(directory, "constructor")
+        def rebuild():
+            shutil.rmtree(local_directory, ignore_errors = True)
+            MIPLIBing(library = library, local_directory = local_directory)
+        def setup(remove_npz):
+            mip = MIPLIBing(library = library, local_directory = local_directory)
+            if remove_npz and os.path.isfile(mip.instances_npz_path):
+                os.remove(mip.instances_npz_path)
+            return mip
+        first_query = lambda mip: mip._select_instances(min_var = 0)
+        result = {"rebuild": timed(rebuild, repeat)}
+        result["warm"] = timed(lambda: MIPLIBing(library = library, local_directory = local_directory), repeat)
+        result["first_query_csv"] = timed(first_query, repeat, lambda: setup(True))
+        result["first_query_npz"] = timed(first_query, repeat, lambda: setup(False))
+        results[library.name] = result
+    shutil.rmtree(os.path.join(directory, "constructor"), ignore_errors = True)
+    return results
+
+
+def bench_refresh(server, directory, repeat):
+    # Refresh of the catalog of each library from the saved pages, which did not change, with conditional
+    # requests answered with 304 (conditional) or with the pages downloaded and compared again (full)
+    from MIPLIBing import MIPLIBing, Libraries
+    server.rows = None
+    results = {}
+    for library in Libraries:
+        local_directory = os.path.join(directory, "refresh")
+        mip = MIPLIBing(library = library, local_directory = local_directory)
+        result = {"conditional": timed(mip.update_catalog, repeat)}
+        server.validators = False
+        try:
+            result["full"] = timed(mip.update_catalog, repeat)
+        finally:
+            server.validators = True
+        results[library.name] = result
+        shutil.rmtree(local_directory, ignore_errors = True)
+    return results
+
+
+def bench_queries(server, directory, sizes, repeat):
+    # Latency of queries against the size of the catalog, compared with reading the CSV file again for every
+    # query, as before the catalog was kept in memory
+    import pandas as pd
+    from MIPLIBing import MIPLIBing, Libraries, Status
+    queries = {
+        "instance_name": dict(instance_name = "inst7"),
+        "range": dict(min_var = 50, max_var = 500, max_cons = 50),
+        "status": dict(with_status = Status.easy),
+        "tags": dict(tags = ["benchmark|decomposition", "~no_solution"]),
+        "all": dict(),
+    }
+    results = {}
+    for size in sizes:
+        server.rows = size
+        local_directory = os.path.join(directory, "queries" + str(size))
+        mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = local_directory)
+        mip._load_catalog()
+        result = {name: timed(lambda: mip._select_instances(**filters), repeat) for name, filters in queries.items()}
+        def reread():
+            df = pd.read_csv(mip.instances_cvs_path)
+            return df[(df['Variables'] >= 50) & (df['Variables'] <= 500) & (df['Constraints'] <= 50)]
+        result["range_csv_reread"] = timed(reread, repeat)
+        results[str(size)] = result
+        shutil.rmtree(local_directory, ignore_errors = True)
+    return results
+
+
+def bench_downloads(server, directory, counts, sizes, workers):
+    # Throughput of get_instances downloading count MIPLIB files of size variables with max_workers threads
+    from MIPLIBing import MIPLIBing, Libraries
+    results = []
+    server.rows = max(counts) + 10
+    for size in sizes:
+        server.size = size
+        for count in counts:
+            for max_workers in workers:
+                local_directory = os.path.join(directory, "downloads")
+                shutil.rmtree(local_directory, ignore_errors = True)
+                mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = local_directory, max_workers = max_workers)
+                for i in range(count): # The files are generated before they are timed
+                    server.content("miplib.zib.de", "/WebData/instances/inst" + str(i) + ".mps.gz")
+                sent = server.bytes_sent
+                start = time.perf_counter()
+                instances = mip.get_instances(max_var = 10 + count - 1)
+                seconds = time.perf_counter() - start
+                received = server.bytes_sent - sent
+                written = sum(os.path.getsize(instance.path) for instance in instances if instance.path is not None)
+                assert len(instances) == count and all(instance.path is not None for instance in instances) # All files should be downloaded
+                results.append({"size": size, "count": count, "max_workers": max_workers, "seconds": seconds,
+                                "bytes_received": received, "bytes_written": written,
+                                "files_per_second": count / seconds, "megabytes_per_second": received / seconds / 2**20})
+                shutil.rmtree(local_directory, ignore_errors = True)
+    return results
+
+
+def bench_resume(server, directory, count, size, max_workers):
+    # Downloads of count MIPLIB files of size variables whose first transfer is cut halfway, so that each
+    # of them is resumed with a Range request; the time includes the pause of the client before retrying
+    from MIPLIBing import MIPLIBing, Libraries
+    server.rows = count + 10
+    server.size = size
+    local_directory = os.path.join(directory, "resume")
+    shutil.rmtree(local_directory, ignore_errors = True)
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = local_directory, max_workers = max_workers)
+    files = [server.content("miplib.zib.de", "/WebData/instances/inst" + str(i) + ".mps.gz") for i in range(count)]
+    server.cuts = count
+    server.cut_after = min(len(body) for body in files) // 2
+    try:
+        start = time.perf_counter()
+        instances, summary = mip.get_instances(max_var = 10 + count - 1, return_summary = True)
+        seconds = time.perf_counter() - start
+    finally:
+        server.cuts = 0
+    assert len(instances) == count and all(instance.path is not None for instance in instances) # All files should be downloaded
+    shutil.rmtree(local_directory, ignore_errors = True)
+    return {"size": size, "count": count, "max_workers": max_workers, "seconds": seconds, "retries": summary.retries,
+            "bytes_received": summary.bytes_received, "bytes_of_files": sum(len(body) for body in files)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd = BENCHMARKS, check = True, capture_output = True, text = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmarks of MIPLIBing against a local stand-in of the sites of the libraries")
+    parser.add_argument("--quick", action = "store_true", help = "smaller catalogs and fewer repetitions")
+    parser.add_argument("--output", help = "file in which the JSON results are written (standard output by default)")
+    parser.add_argument("--latency", type = float, default = 0.0, help = "seconds before the server answers each request")
+    parser.add_argument("--rows", type = int, default = None, help = "number of instances in synthetic catalogs for the constructor benchmark, instead of the saved pages")
+    parser.add_argument("--check", action = "store_true", help = "fails if importing the package or looking up a cached instance by name imports pandas, numpy, or requests, or takes longer than --max-startup")
+    parser.add_argument("--max-startup", type = float, default = 0.25, help = "seconds allowed for the import and the lookup with --check")
+    args = parser.parse_args()
+
+    repeat = 3 if args.quick else 10
+    sizes = [100, 1000] if args.quick else [100, 1000, 10000]
+    counts = [4, 16] if args.quick else [8, 64]
+    file_sizes = [100, 10000] if args.quick else [100, 100000]
+    workers = [1, 8]
+
+    server = FixtureServer(latency = args.latency)
+    os.environ["http_proxy"] = server.url
+    os.environ.pop("no_proxy", None)
+    os.environ.pop("NO_PROXY", None)
+    directory = tempfile.mkdtemp(prefix = "MIPLIBing_benchmarks_")
+    try:
+        results = {"import": bench_import(repeat)}
+        results["startup"] = bench_startup(server, directory, repeat)
+        results["constructor"] = bench_constructor(server, directory, args.rows, repeat)
+        results["refresh"] = bench_refresh(server, directory, repeat)
+        results["queries"] = bench_queries(server, directory, sizes, repeat)
+        results["downloads"] = bench_downloads(server, directory, counts, file_sizes, workers)
+        results["resume"] = bench_resume(server, directory, max(counts), max(file_sizes), max(workers))
+    finally:
+        server.close()
+        shutil.rmtree(directory, ignore_errors = True)
+
+    report = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"quick": args.quick, "latency": args.latency, "rows": args.rows, "repeat": repeat},
+        "results": results,
+    }
+    output = json.dumps(report, indent = 2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.check:
+        for name in ["import", "startup"]:
+            result = results[name]
+            if result["heavy_modules"]:
+                sys.exit("Check failed: " + name + " imports " + ", ".join(result["heavy_modules"]))
+            if result["median"] > args.max_startup:
+                sys.exit("Check failed: " + name + " takes " + str(round(result["median"], 3)) + " s")
+
+
+if __name__ == "__main__":
+    main()
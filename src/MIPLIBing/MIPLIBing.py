@@ -1,14 +1,31 @@
 from enum import Enum
-import pandas as pd
 import csv
 import math
-import numpy as np
-import requests
-import urllib.request as url_req
-from urllib.error import HTTPError
 import gzip as gz
 import shutil as shu
 import os
+import re
+import socket
+import uuid
+import zlib
+import hashlib
+import io
+import json
+import time
+import threading
+import warnings
+import html
+import logging
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+from . import models
+from .lazy import LazyModule
+
+# Imported when first used, so that looking up cached instances does not need them
+pd = LazyModule("pandas", globals(), "pd")
+np = LazyModule("numpy", globals(), "np")
+requests = LazyModule("requests", globals(), "requests")
+zipfile = LazyModule("zipfile", globals(), "zipfile")
 
 
 def Boolean_str(value):
@@ -22,7 +39,9 @@ def Boolean_str(value):
 
 class Instance:
 
-    def __init__(self, name, problem_type, path, feasible, primal, dual, status, nb_var, nb_bin, nb_int, nb_cont, nb_const, nb_nz, sos = None, semi = None, obj_density=None, problematic_ev_density=None, quadratic_cons=None, objective_type=None, variables_type=None, constraints_type=None):
+    __slots__ = ['name', 'problem_type', 'path', 'feasible', 'primal', 'dual', 'status', 'nb_var', 'nb_bin', 'nb_int', 'nb_cont', 'nb_const', 'nb_nz', 'sos', 'semi', 'obj_density', 'problematic_ev_density', 'quadratic_cons', 'objective_type', 'variables_type', 'constraints_type', 'cache', 'library']
+
+    def __init__(self, name, problem_type, path, feasible, primal, dual, status, nb_var, nb_bin, nb_int, nb_cont, nb_const, nb_nz, sos = None, semi = None, obj_density=None, problematic_ev_density=None, quadratic_cons=None, objective_type=None, variables_type=None, constraints_type=None, cache=None, library=None):
         self.name = name
         self.problem_type = problem_type
         self.path = path
@@ -44,6 +63,44 @@ class Instance:
         self.objective_type = objective_type
         self.variables_type = variables_type
         self.constraints_type = constraints_type
+        self.cache = cache # Inflated copies of the file, if it is kept compressed in the cache
+        self.library = library
+
+    def open(self, mode = 'rb'):
+        # File object for the instance, decompressing on the fly if the file is kept compressed
+        assert self.path is not None # The instance file was not downloaded
+        if self.path.endswith(".gz"):
+            return gz.open(self.path, mode)
+        return open(self.path, mode)
+
+    def materialize(self):
+        # Path to an uncompressed copy of the instance, for tools that need a plain file
+        assert self.path is not None # The instance file was not downloaded
+        if self.cache is None:
+            return self.path
+        return self.cache.materialize(self.path)
+
+    def load_model(self, cache = True):
+        # Model of the instance as NumPy arrays (see models.Model). The file is parsed only once, after which
+        # the arrays are memory-mapped from the cache. The sizes are checked against those in the catalog.
+        assert self.path is not None # The instance file was not downloaded
+        model = models.load_model(self.path, cache)
+        if isinstance(model, models.QuadraticModel): # The quadratic terms are also checked for QPLIB
+            attributes = ['nb_var', 'nb_const', 'obj_density', 'quadratic_cons']
+        else:
+            attributes = ['nb_var', 'nb_const', 'nb_nz']
+        for attribute in attributes:
+            expected = getattr(self, attribute)
+            value = getattr(model, attribute)
+            if expected is None:
+                continue
+            if attribute == 'obj_density': # The catalog rounds the density
+                mismatch = abs(value - expected) > 0.01 + 0.01 * expected
+            else:
+                mismatch = value != expected
+            if mismatch:
+                warnings.warn("Instance " + self.name + " has " + attribute + " = " + str(value) + " in its file but " + str(expected) + " in the catalog")
+        return model
 
     def __str__(self):
 
@@ -76,6 +133,540 @@ class Instance:
                 "Non-zeroes:            \t" + str(self.nb_nz) + "\n\n")
 
 
+def temporary_path(path):
+    # Unique hidden name next to path, so that the final rename stays within one file system
+    directory, name = os.path.split(path)
+    return os.path.join(directory, "." + name + "." + uuid.uuid4().hex + ".part")
+
+
+def file_digest(path):
+    # Size and SHA-256 of a file, or None if it does not exist
+    if not os.path.isfile(path):
+        return None
+    hasher = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+            size += len(chunk)
+    return size, hasher.hexdigest()
+
+
+def catalog_to_arrays(df):
+    # One array per column: numeric columns as they are, and other columns as integer codes into
+    # their distinct values (-1 for missing values), so that no Python objects need to be stored
+    arrays = {"columns": np.array(df.columns, dtype=str)}
+    for i, column in enumerate(df.columns):
+        if pd.api.types.is_numeric_dtype(df[column]) or pd.api.types.is_bool_dtype(df[column]):
+            arrays["c"+str(i)] = df[column].to_numpy()
+        else:
+            codes, values = pd.factorize(df[column])
+            arrays["c"+str(i)+"_codes"] = codes.astype(np.int32)
+            arrays["c"+str(i)+"_values"] = np.array(values, dtype=str)
+    return arrays
+
+
+def catalog_from_arrays(data):
+    # Inverse of catalog_to_arrays
+    columns = {}
+    for i, column in enumerate(data["columns"].tolist()):
+        if "c"+str(i) in data:
+            columns[column] = data["c"+str(i)]
+        else:
+            codes = data["c"+str(i)+"_codes"]
+            values = np.append(data["c"+str(i)+"_values"].astype(object), np.nan) # Code -1 picks the last value
+            columns[column] = values[codes]
+    return pd.DataFrame(columns)
+
+
+class CatalogIndex:
+    # Sorted copies of the numeric columns of a catalog, so that range filters are binary searches, and
+    # bitsets of the rows holding each MIPLIB tag, so that tag filters are bitwise operations
+
+    def __init__(self, df):
+        self.size = len(df)
+        self.sorted = {}
+        for column in df.columns:
+            if pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column]):
+                values = df[column].to_numpy(dtype=float)
+                order = np.argsort(values, kind='stable') # Missing values are sorted last
+                valid = len(values) - int(np.isnan(values).sum())
+                self.sorted[column] = (values[order][:valid], order[:valid])
+
+        self.tags = {}
+        self.tag_cache = {}
+        if 'Tags' in df:
+            self.tag_column = df['Tags']
+            rows = {}
+            for i, tags in enumerate(self.tag_column.tolist()):
+                if isinstance(tags, str):
+                    for tag in set(re.findall(r"[\w\-]+", tags)):
+                        rows.setdefault(tag, []).append(i)
+            for tag, positions in rows.items():
+                mask = np.zeros(self.size, dtype=bool)
+                mask[positions] = True
+                self.tags[tag] = np.packbits(mask)
+
+    def range(self, column, low, high):
+        # Rows in which column is between low and high (each bound is ignored if None)
+        values, order = self.sorted[column]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        end = len(values) if high is None else np.searchsorted(values, high, side='right')
+        mask = np.zeros(self.size, dtype=bool)
+        mask[order[start:end]] = True
+        return mask
+
+    def tag(self, term):
+        # Rows whose tags match the regular expression term, as with str.contains. A term made of tag
+        # characters and "|" can only match inside tags, so its rows are the union of the bitsets of the
+        # tags containing any of its alternatives; other terms are searched in the column.
+        if term not in self.tag_cache:
+            if re.fullmatch(r"[\w\-]+(\|[\w\-]+)*", term):
+                bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+                alternatives = term.split("|")
+                for tag, tag_bits in self.tags.items():
+                    if any(alternative in tag for alternative in alternatives):
+                        bits |= tag_bits
+                mask = np.unpackbits(bits, count=self.size).astype(bool)
+            else:
+                mask = self.tag_column.str.contains(term, na=False).to_numpy(dtype=bool)
+            self.tag_cache[term] = mask
+        return self.tag_cache[term]
+
+
+def catalog_changes(old, new):
+    # Names of the instances added, removed, or with any different value from one catalog to the other
+    columns = [column for column in old.columns.union(new.columns) if not column.startswith("Unnamed")]
+    old = old.set_index("Instance").reindex(columns = [column for column in columns if column != "Instance"])
+    new = new.set_index("Instance").reindex(columns = [column for column in columns if column != "Instance"])
+    added = [instance for instance in new.index if instance not in old.index]
+    removed = [instance for instance in old.index if instance not in new.index]
+    common = [instance for instance in new.index if instance in old.index]
+    before = old.loc[common].astype(object)
+    after = new.loc[common].astype(object)
+    different = ~((before == after) | (before.isna() & after.isna()))
+    changed = [instance for instance, row in zip(common, different.any(axis=1)) if row]
+    return {"added":added, "removed":removed, "changed":changed}
+
+
+def write_json(path, data):
+    # Replaces a JSON file atomically
+    temp = temporary_path(path)
+    with open(temp, 'w') as f:
+        json.dump(data, f, indent = 1, sort_keys = True)
+    os.replace(temp, path)
+
+
+def link_file(source, path):
+    # Places source at path as a hard link, a symbolic link, or a copy, whichever the file system allows
+    temp = temporary_path(path)
+    try:
+        os.link(source, temp)
+    except OSError:
+        try:
+            os.symlink(os.path.abspath(source), temp)
+        except OSError:
+            shu.copyfile(source, temp)
+    os.replace(temp, path)
+
+
+logger = logging.getLogger("MIPLIBing")
+logger.addHandler(logging.NullHandler()) # Records are only shown by the handlers of the application
+
+
+class Summary:
+    # Metrics of the events of a MIPLIBing object (see MIPLIBing._emit): seconds spent in each phase, cache
+    # hits and misses, files linked from the shared store or extracted from a snapshot, files downloaded,
+    # bytes received and written (and, among them, inflated), retries, seconds taken by the file of each
+    # instance, and failed files as tuples (instance, url, error)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.store_links = 0
+        self.snapshot_extractions = 0
+        self.files_downloaded = 0
+        self.bytes_received = 0
+        self.bytes_written = 0
+        self.bytes_inflated = 0
+        self.retries = 0
+        self.latencies = {}
+        self.failures = []
+
+    def record(self, event, fields):
+        with self.lock:
+            if event == "phase":
+                self.phases[fields["phase"]] = self.phases.get(fields["phase"], 0.0) + fields["seconds"]
+            elif event == "cache_hit":
+                self.cache_hits += 1
+            elif event in ["store_link", "snapshot_extract", "download_start"]:
+                self.cache_misses += 1
+                self.store_links += event == "store_link"
+                self.snapshot_extractions += event == "snapshot_extract"
+            elif event == "download_done":
+                self.files_downloaded += 1
+                self.bytes_received += fields["bytes_received"]
+                self.bytes_written += fields["bytes_written"]
+                if fields["inflated"]:
+                    self.bytes_inflated += fields["bytes_written"]
+            elif event == "download_retry":
+                self.retries += 1
+            elif event == "download_failed":
+                self.failures.append((fields["instance"], fields["url"], fields["error"]))
+            if "seconds" in fields and "instance" in fields:
+                self.latencies[fields["instance"]] = fields["seconds"]
+
+    def to_dict(self):
+        with self.lock:
+            return {key: value for key, value in self.__dict__.items() if key != "lock"}
+
+    def __str__(self):
+        return ("Phases (s):            \t" + ", ".join(phase + " " + str(round(seconds, 3)) for phase, seconds in self.phases.items()) + "\n" +
+                "Cache:                 \t" + str(self.cache_hits) + " hits\t (" + str(self.cache_misses) + " misses)\t (" + str(self.store_links) + " from store)\t (" + str(self.snapshot_extractions) + " from snapshot)\n" +
+                "Downloads:             \t" + str(self.files_downloaded) + " files\t (" + str(self.bytes_received) + " bytes received)\t (" + str(self.bytes_written) + " bytes written)\t (" + str(self.retries) + " retries)\n" +
+                "Failures:              \t" + str(len(self.failures)) + "\n")
+
+
+# Locks of the threads of this process for each lock file, so that only one of them polls the file, with the
+# number of threads using each of them, so that the lock of a file is forgotten when no thread uses it
+THREAD_LOCKS = {}
+THREAD_LOCKS_GUARD = threading.Lock()
+
+
+class FileLock:
+    # Lock file shared by the threads and processes (also on other hosts) that use the same cache.
+    # A lock is stale if its holder is a dead process on this host, or if it was not refreshed for
+    # stale_after seconds, in which case it is broken by the next process trying to acquire it.
+    # The file holds a token unique to each acquisition, so that a holder whose lock was broken
+    # does not remove the lock of the next holder.
+    # Threads of the same process wait for each other on a thread lock, without polling.
+
+    def __init__(self, path, stale_after = 600):
+        self.path = path
+        self.stale_after = stale_after
+        self.refreshed = None
+        self.holder = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def acquire(self):
+        with THREAD_LOCKS_GUARD:
+            entry = THREAD_LOCKS.setdefault(self.path, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        try:
+            self._acquire_file()
+        except BaseException:
+            self._release_thread()
+            raise
+
+    def _acquire_file(self):
+        delay = 0.05
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._is_stale():
+                    self._break()
+                    continue
+                time.sleep(delay)
+                delay = min(2 * delay, 1.0)
+                continue
+            self.holder = socket.gethostname() + " " + str(os.getpid()) + " " + uuid.uuid4().hex
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.holder + "\n")
+            self.refreshed = time.time()
+            return
+
+    def refresh(self):
+        # Tells other processes that the holder is still alive; cheap enough to be called often
+        if time.time() - self.refreshed > min(10, self.stale_after / 4):
+            if self._read_holder() == self.holder:
+                os.utime(self.path)
+            self.refreshed = time.time()
+
+    def release(self):
+        # Removes the lock file only if it still holds the token of this lock
+        try:
+            if self._read_holder() == self.holder:
+                os.remove(self.path)
+            else:
+                warnings.warn("Lock " + self.path + " was broken as stale while it was held")
+        finally:
+            self._release_thread()
+
+    def _release_thread(self):
+        with THREAD_LOCKS_GUARD:
+            entry = THREAD_LOCKS[self.path]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del THREAD_LOCKS[self.path]
+        entry[0].release()
+
+    def _read_holder(self):
+        # Content of the lock file, or None if there is none
+        try:
+            with open(self.path) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _is_stale(self):
+        try:
+            with open(self.path) as f:
+                holder = f.read().split()
+            age = time.time() - os.path.getmtime(self.path)
+        except FileNotFoundError: # Released in the meantime
+            return False
+        if age > self.stale_after:
+            return True
+        if len(holder) >= 2 and holder[0] == socket.gethostname():
+            try:
+                os.kill(int(holder[1]), 0)
+            except ProcessLookupError:
+                return True
+            except (OSError, ValueError):
+                pass
+        return False
+
+    def _break(self):
+        # Moves the stale lock away first, so that only one of the processes breaking it removes it
+        temp = temporary_path(self.path)
+        try:
+            os.rename(self.path, temp)
+        except FileNotFoundError:
+            return
+        os.remove(temp)
+
+
+def lock_path(path):
+    # Hidden lock file next to path
+    directory, name = os.path.split(path)
+    return os.path.join(directory, "." + name + ".lock")
+
+
+class SharedStore:
+    # Content-addressed files shared by the libraries of a cache: each file is stored once under its
+    # SHA-256, and an index maps each source (URL and transformation) to the stored file
+
+    def __init__(self, directory, lock_timeout = 600):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock_timeout = lock_timeout
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def _read_index(self):
+        if not os.path.isfile(self.index_path):
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def link(self, key, path):
+        # Places the stored file for key at path and returns its entry, or None if it is not stored
+        entry = self._read_index().get(key)
+        if entry is None:
+            return None
+        source = self._object_path(entry["sha256"])
+        if not os.path.isfile(source) or os.path.getsize(source) != entry["size"]:
+            return None
+        link_file(source, path)
+        return entry
+
+    def put(self, path, entry):
+        # Stores the file at path, which must have the size and SHA-256 given in entry; it can be linked
+        # once add records it in the index
+        source = self._object_path(entry["sha256"])
+        if not os.path.isfile(source):
+            os.makedirs(os.path.dirname(source), exist_ok = True)
+            link_file(path, source)
+
+    def add(self, entries):
+        # Records the stored files given by key in the index, in one write
+        os.makedirs(self.directory, exist_ok = True)
+        with FileLock(lock_path(self.index_path), self.lock_timeout):
+            index = self._read_index()
+            index.update(entries)
+            write_json(self.index_path, index)
+
+    def discard(self, key):
+        # Forgets the stored file for key if it is corrupt, that is, if it no longer has the size and SHA-256
+        # of its entry (for instance because a linked copy of it was modified in place). A valid stored file
+        # is kept, so that it can be linked again instead of being downloaded.
+        entry = self._read_index().get(key)
+        if entry is None:
+            return
+        if file_digest(self._object_path(entry["sha256"])) == (entry["size"], entry["sha256"]):
+            return
+        with FileLock(lock_path(self.index_path), self.lock_timeout):
+            index = self._read_index()
+            if index.get(key) != entry: # Stored again by another process in the meantime
+                return
+            del index[key]
+            write_json(self.index_path, index)
+        source = self._object_path(entry["sha256"])
+        if os.path.isfile(source):
+            os.remove(source)
+
+
+class Snapshot:
+    # Read-only zip archive with the catalogs and instance files of library caches (see
+    # MIPLIBing.export_snapshot), with one directory per library. The central directory of the archive is
+    # the table of offsets of its members, so that each member is extracted alone, when it is needed.
+
+    def __init__(self, path):
+        self.path = path
+        self.archive = zipfile.ZipFile(path)
+        self.names = set(self.archive.namelist())
+        self.entries = {} # Manifest entries of the instance files, by member name
+        for name in self.names:
+            if os.path.basename(name) == "manifest.json":
+                directory = os.path.dirname(name)
+                for file_name, entry in json.loads(self.archive.read(name)).items():
+                    self.entries[directory + "/" + file_name] = entry
+
+    def copy(self, name, f_out):
+        # Writes the content of a member into the file object f_out
+        with self.archive.open(name) as f_in:
+            shu.copyfileobj(f_in, f_out, 2**20)
+
+    def extract(self, name, path):
+        # Extracts a member into path, replacing it atomically; returns False if the archive does not hold it
+        if name not in self.names:
+            return False
+        temp = temporary_path(path)
+        try:
+            with open(temp, 'xb') as f_out:
+                self.copy(name, f_out)
+            os.replace(temp, path)
+        finally:
+            if os.path.isfile(temp):
+                os.remove(temp)
+        return True
+
+
+class Inflater:
+    # Incremental gunzip of a byte stream, including files made of several gzip members
+
+    def __init__(self):
+        self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def process(self, data):
+        output = []
+        while data:
+            output.append(self.decompressor.decompress(data))
+            data = self.decompressor.unused_data
+            if data: # A new gzip member starts after the end of the current one
+                self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return b"".join(output)
+
+    def finish(self):
+        output = self.decompressor.flush()
+        if not self.decompressor.eof:
+            raise EOFError("Compressed stream ended before the end of the file")
+        return output
+
+
+class Deflater:
+    # Incremental gzip of a byte stream
+
+    def __init__(self):
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def process(self, data):
+        return self.compressor.compress(data)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class InflatedCache:
+    # Directory of inflated copies of compressed instance files, whose total size is kept under
+    # max_size bytes by removing the least recently used copies. It may be shared by several processes:
+    # each copy is written and removed under its own lock, the size and modification time of its source
+    # are kept in a hidden file next to it, so that a copy of a file that changed is inflated again, and
+    # copies used in the last min_age seconds are not removed, as another process may be about to open them.
+
+    def __init__(self, directory, max_size, lock_timeout = 600, min_age = 10):
+        self.directory = directory
+        self.max_size = max_size
+        self.lock_timeout = lock_timeout
+        self.min_age = min_age
+
+    def _source_path(self, target):
+        directory, name = os.path.split(target)
+        return os.path.join(directory, "." + name + ".source")
+
+    def materialize(self, path):
+        target = os.path.join(self.directory, os.path.basename(path)[:-len(".gz")])
+        stat = os.stat(path)
+        source = {"path":os.path.abspath(path), "size":stat.st_size, "mtime":stat.st_mtime_ns}
+        os.makedirs(self.directory, exist_ok = True)
+        with FileLock(lock_path(target), self.lock_timeout):
+            if os.path.isfile(target) and self._read_source(target) == source:
+                os.utime(target) # Marks the copy as recently used
+                return target
+
+            temp = temporary_path(target)
+            try:
+                with gz.open(path, 'rb') as f_in:
+                    with open(temp, 'xb') as f_out:
+                        shu.copyfileobj(f_in, f_out, 1 << 20)
+                os.replace(temp, target)
+                write_json(self._source_path(target), source)
+            finally:
+                if os.path.isfile(temp):
+                    os.remove(temp)
+
+        self._evict(target) # Outside of the lock of the copy, as the locks of the others are taken one at a time
+        return target
+
+    def _read_source(self, target):
+        try:
+            with open(self._source_path(target)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _evict(self, keep):
+        # Removes the least recently used copies, except keep and those used in the last min_age seconds, until
+        # the total size fits
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.startswith("."): # Copies being written, locks, and sources of the copies
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError: # Removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+            with FileLock(lock_path(path), self.lock_timeout):
+                try:
+                    if time.time() - os.stat(path).st_mtime < self.min_age: # Used since it was listed
+                        continue
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                if os.path.isfile(self._source_path(path)):
+                    os.remove(self._source_path(path))
+            total -= size
+
+
 def parse_qplib_format(X):
     return X.split("(")[1].replace(",", "").replace(")", "") # Keep format names between () without ,
 
@@ -84,6 +675,80 @@ def parse_qplib_name(X):
     return X.split(" ")[0]
 
 
+def parse_qplib_solutions(content):
+    # Best known objective value of each instance from the lines "=best= QPLIB_<instance> <value>" of qplib.solu
+    values = {}
+    for line in content.decode().split("\n"):
+        pieces = line.split()
+        if len(pieces)>2 and pieces[0]=="=best=":
+            values[pieces[1].split("_")[1]] = float(pieces[2])
+    return values
+
+
+TABLE_ROW = re.compile(r"<tr\b[^>]*>(.*?)</tr\s*>", re.IGNORECASE | re.DOTALL)
+TABLE_CELL = re.compile(r"<(t[dh])\b([^>]*)>(.*?)</t[dh]\s*>", re.IGNORECASE | re.DOTALL)
+TABLE_SECTION = re.compile(r"<(thead|tbody|tfoot)\b[^>]*>(.*?)</\1\s*>", re.IGNORECASE | re.DOTALL)
+TAG = re.compile(r"<[^>]*>")
+LINE_BREAK = re.compile(r"<br\b[^>]*>", re.IGNORECASE)
+COLSPAN = re.compile(r"colspan\s*=\s*[\"']?(\d+)", re.IGNORECASE)
+WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+
+
+def read_first_table(page):
+    # First table of an HTML page as a DataFrame with the same values and types as pd.read_html, or None
+    # if its layout needs the full HTML parser (nested tables, rowspan, cells without closing tags, or
+    # several header rows). Rows and cells are extracted with regular expressions from the table alone.
+    charset = re.search(rb"charset=[\"']?([\w-]+)", page[:2048])
+    text = page.decode(charset.group(1).decode() if charset else "utf-8", errors = "replace")
+    lower = text.lower()
+    start = lower.find("<table")
+    end = lower.find("</table", start)
+    if start < 0 or end < 0:
+        return None
+    table = text[start:end]
+    lower = lower[start:end]
+    if lower.find("<table", 1) >= 0 or "rowspan" in lower or lower.count("<td") != lower.count("</td") or lower.count("<th") - lower.count("<thead") != lower.count("</th") - lower.count("</thead"):
+        return None
+
+    sections = {"thead":[], "tbody":[], "tfoot":[]}
+    found = TABLE_SECTION.findall(table)
+    if found:
+        for name, content in found:
+            sections[name.lower()] += TABLE_ROW.findall(content)
+    else:
+        sections["tbody"] = TABLE_ROW.findall(table)
+
+    rows = []
+    for name in ["thead", "tbody", "tfoot"]:
+        for row in sections[name]:
+            cells = TABLE_CELL.findall(row)
+            values = []
+            for tag, attributes, content in cells:
+                colspan = COLSPAN.search(attributes)
+                text = TAG.sub("", LINE_BREAK.sub("\n", content)) # Line breaks separate words, as in pd.read_html
+                value = WHITESPACE.sub(" ", html.unescape(text).strip())
+                values += [value] * (int(colspan.group(1)) if colspan else 1)
+            rows.append((name, all(tag.lower() == "th" for tag, attributes, content in cells), values))
+
+    # Header rows are those in thead or, without thead, the leading rows made only of th cells
+    if sections["thead"]:
+        header = len(sections["thead"])
+    else:
+        header = 0
+        while header < len(rows) and rows[header][1]:
+            header += 1
+    if header != 1:
+        return None
+
+    # The values are parsed as CSV, which infers the same types as pd.read_html with its default options
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for name, only_th, values in rows:
+        writer.writerow(values)
+    buffer.seek(0)
+    return pd.read_csv(buffer, thousands = ",")
+
+
 class Libraries(Enum):
     MIPLIB2017_Benchmark = 1
     MIPLIB2017_Collection = 2
@@ -100,12 +765,22 @@ class Status(Enum):
 
 class MIPLIBing:
 
-    def __init__(self, library = Libraries.MIPLIB2017_Benchmark, update_csv = False, verbose = False, local_directory = "MIPLIBing_cache", file_extension = None):
+    def __init__(self, library = Libraries.MIPLIB2017_Benchmark, update_csv = False, verbose = False, local_directory = "MIPLIBing_cache", file_extension = None, max_workers = 1, retries = 3, compressed_cache = False, inflated_cache_size = 2**30, lock_timeout = 600, refresh_ttl = None, snapshot = None, callbacks = None, timeout = (10, 60)):
         self.verbose = verbose
         self.library = library
+        self.max_workers = max_workers
+        self.retries = retries
+        self.timeout = timeout # Seconds to connect and between bytes received, for every HTTP request
+        self.lock_timeout = lock_timeout
 
         assert type(library)==Libraries # Library should belong to the enumuration
 
+        # Functions called with each event, and summaries recording them (see _emit)
+        self.callbacks = list(callbacks) if callbacks is not None else []
+        self.metrics = Summary()
+        self.summaries = [self.metrics]
+        assert max_workers >= 1 # At least one download should run at a time
+
         assert not ( library in [Libraries.MIPLIB2017_Benchmark, Libraries.MIPLIB2017_Collection] and file_extension != None ) # MIPLIB2017 does not require file extension
 
         if library == Libraries.MINLPLIB and file_extension == None: # Use default file extension for MINLPLIB
@@ -158,314 +833,1133 @@ class MIPLIBing:
             self.solution_values_url = "http://qplib.zib.de/qplib.solu"
             self.instances_csv_file = "QPLIB.csv"
 
+        # Files are inflated on download (MIPLIB) or kept as they are, unless they should stay compressed
+        # in the cache, in which case MIPLIB files are kept as they are and other files are gzipped
+        self.compressed_cache = compressed_cache
+        if not compressed_cache:
+            self.codec = Inflater if self.remote_file_ext.endswith(".gz") else None
+            self.inflated_cache = None
+        else:
+            self.codec = None if self.remote_file_ext.endswith(".gz") else Deflater
+            self.local_file_ext = self.remote_file_ext if self.remote_file_ext.endswith(".gz") else self.local_file_ext + ".gz"
+            self.inflated_cache = InflatedCache(os.path.join(self.local_directory, "inflated"), inflated_cache_size, lock_timeout)
+
+
+        # Shared HTTP session (see session), created when first needed
+        self._session = None
+        self.session_lock = threading.Lock()
 
         # Path to local csv file
         self.instances_cvs_path = os.path.join(self.local_directory, self.instances_csv_file)
 
+        # Path to the binary copy of the csv file, and catalog loaded from either
+        self.instances_npz_path = os.path.splitext(self.instances_cvs_path)[0] + ".npz"
+        self.catalog = None
+        self.catalog_mtime = None
+        self.catalog_columns = None
+        self.catalog_index = None
+        self.catalog_rows = None
+        self.catalog_urls = None
+        self.catalog_formats = None
+
+        # Path to the structural features computed from the cached files, which extend the catalog
+        self.features_path = os.path.splitext(self.instances_cvs_path)[0] + ".features.csv"
+        self.features_mtime = None
+
+        # Path to the rows of the catalog saved as JSON, read without pandas to look up instances by name
+        self.instances_rows_path = os.path.splitext(self.instances_cvs_path)[0] + ".rows.json"
+        self.saved_rows = None
+        self.saved_rows_mtime = None
+
+        # Path to the manifest of downloaded files
+        self.manifest_path = os.path.join(self.local_directory, "manifest.json")
+
+        # Files shared by all libraries in the same cache
+        self.store = SharedStore(os.path.join(local_directory, "_store"), lock_timeout)
+
         # Create local cache directory if it does not exist
-        if not os.path.exists(self.local_directory):
-            os.makedirs(self.local_directory)
-
-        # Check if local csv file exists
-        csv_file_exists = os.path.isfile(self.instances_cvs_path)
-
-        # Download csv file if required
-        if update_csv or not csv_file_exists:
-            if self.verbose:
-                print("Downloading instance data to CSV file")
-
-            df = pd.read_html(self.instances_url)[0]
-
-            if library == Libraries.MIPLIB2017_Benchmark or library == Libraries.MIPLIB2017_Collection:
-                df.rename(columns = {"Objective":"Primal"}, inplace = True)
-
-            elif library == Libraries.MINLPLIB:
-                df.rename(columns = {
-                     df.columns[0]:"Instance",    # Name
-                     df.columns[1]:"Formats",     # Formats(i)
-                     df.columns[2]:"Type",        # Type(i)
-                     df.columns[3]:"Convex",      # C(i)
-                     df.columns[4]:"Variables",   # #Vars(i)
-                     df.columns[5]:"Binaries",    # #BinVars(i)
-                     df.columns[6]:"Integers",    # #IntVars(i)
-                     df.columns[7]:"Constraints", # #Vars(i)
-                     df.columns[8]:"SOS",         # #SOS(i)
-                     df.columns[9]:"Semi",        # #Semi(i)
-                     df.columns[10]:"Nonz.",      # #NZ(i)
-                     df.columns[11]:"Status",     # S(i)
-                     df.columns[12]:"Dual",       # Dual Bound(i)
-                     df.columns[13]:"Primal",     # Primal Bound(i)
-                     df.columns[14]:"Points"      # Points(i)
-                    }, inplace = True)
-                df.fillna({"Convex":"-","Binaries":0, "Integers":0, "SOS":0, "Semi":0, "Status":"-"}, inplace=True)
-                df["Continuous"] = df["Variables"] - df["Binaries"] - df["Integers"]
-                df["Convex"].replace({"-":"No", "✔":"Yes"}, inplace=True)
-                df["Status"].replace({"-":"open", "✔":"closed"}, inplace=True)
-
-            elif library == Libraries.QPLIB:
-                df.drop(df.tail(1).index, inplace=True) # Removes last row (not an instance)
-                df["Format"] = df["Instance"].apply(parse_qplib_format)
-                df["Instance"] = df["Instance"].apply(parse_qplib_name)
-                df.rename(columns = {
-                             "Cvx":"Convex",
-                             "O":"Objective type",
-                             "V":"Variables type",
-                             "C":"Constraints type",
-                             "TotalVars.":"Variables",
-                             "BinaryVars.":"Binaries",
-                             "IntegerVars.":"Integers",
-                             "TotalCons.":"Constraints",
-                             "Quad.Cons.":"Quadratic constraints",
-                             "Non-zeros":"Nonz."
-                            }, inplace = True)
-                df.fillna({"Binaries":0, "Integers":0}, inplace=True)
-                df["Continuous"] = df["Variables"] - df["Binaries"] - df["Integers"]
-                df["Convex"].replace({"-":"No", "✔":"Yes"}, inplace=True)
-                df["Primal"] = np.nan
-
-                content = requests.get(self.solution_values_url)
-                lines = content.text.split("\n")
-                for line in lines:
-                    pieces = line.split()
-                    if len(pieces)>0:
-                        if pieces[0]=="=best=":
-                            instance = pieces[1].split("_")[1]
-                            value = float(pieces[2])
-                            df.loc[df['Instance']==instance, 'Primal'] = value
-
-            df.to_csv(self.instances_cvs_path, quoting=csv.QUOTE_NONNUMERIC)
-
-
-    def get_instances(self, instance_name = None, min_var = None, max_var = None, min_bin = None, max_bin = None, min_int = None, max_int = None, min_cont = None, max_cont = None, min_cons = None, max_cons = None, min_nz = None, max_nz = None, with_status = None, without_status = None, min_sos = None, max_sos = None, min_semi = None, max_semi = None, problem_type = None, min_obj_density = None, max_obj_density = None, min_problematic_ev_density = None, max_problematic_ev_density = None, min_quadratic_cons = None, max_quadratic_cons = None, objective_type = None, variables_type = None, constraints_type = None, tags = None):
+        os.makedirs(self.local_directory, exist_ok = True)
+
+        # Snapshot used as a read-only cache, from which the catalog and instance files are extracted when missing
+        self.snapshot = Snapshot(snapshot) if snapshot is not None else None
+
+        # Download csv file if required, or refresh it if it was last checked more than refresh_ttl seconds ago
+        self.catalog_meta_path = os.path.splitext(self.instances_cvs_path)[0] + ".meta.json"
+        self.catalog_changes = None
+        if self.snapshot is not None and not update_csv and not os.path.isfile(self.instances_cvs_path):
+            self._extract_catalog(self.snapshot)
+        if update_csv or not os.path.isfile(self.instances_cvs_path):
+            self.update_catalog()
+        elif refresh_ttl is not None and time.time() - self._read_catalog_meta().get("checked", 0) > refresh_ttl:
+            self.update_catalog()
+
+
+    def get_instances(self, instance_name = None, min_var = None, max_var = None, min_bin = None, max_bin = None, min_int = None, max_int = None, min_cont = None, max_cont = None, min_cons = None, max_cons = None, min_nz = None, max_nz = None, with_status = None, without_status = None, min_sos = None, max_sos = None, min_semi = None, max_semi = None, problem_type = None, min_obj_density = None, max_obj_density = None, min_problematic_ev_density = None, max_problematic_ev_density = None, min_quadratic_cons = None, max_quadratic_cons = None, objective_type = None, variables_type = None, constraints_type = None, tags = None, max_workers = None, return_summary = False, **features):
+        summary = Summary()
+        self.summaries.append(summary)
+        try:
+            instance_list, downloads = self._select_instances(instance_name, min_var, max_var, min_bin, max_bin, min_int, max_int, min_cont, max_cont, min_cons, max_cons, min_nz, max_nz, with_status, without_status, min_sos, max_sos, min_semi, max_semi, problem_type, min_obj_density, max_obj_density, min_problematic_ev_density, max_problematic_ev_density, min_quadratic_cons, max_quadratic_cons, objective_type, variables_type, constraints_type, tags, **features)
+
+            # Missing files are fetched concurrently; results keep the order of the catalog
+            self._download_all(downloads, max_workers)
+        finally:
+            self.summaries.remove(summary)
+
+        if return_summary:
+            return instance_list, summary
+        return instance_list
+
+
+    @property
+    def session(self):
+        # Shared HTTP session, so that concurrent downloads reuse keep-alive connections to each host
+        with self.session_lock:
+            if self._session is None:
+                self._session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections = 4, pool_maxsize = self.max_workers)
+                self._session.mount("http://", adapter)
+                self._session.mount("https://", adapter)
+            return self._session
+
+    @session.setter
+    def session(self, session):
+        self._session = session
+
+
+    def add_callback(self, callback):
+        # Registers a function called as callback(event, fields) with each event (see _emit)
+        self.callbacks.append(callback)
+
+
+    def _emit(self, event, message = None, level = logging.INFO, **fields):
+        # Reports an event with its fields to the summaries, the callbacks, and the logger "MIPLIBing" (with
+        # the attributes event and fields on the log record). The message is also printed if verbose.
+        fields["library"] = self.library.name
+        for summary in list(self.summaries):
+            summary.record(event, fields)
+        for callback in list(self.callbacks):
+            callback(event, fields)
+        if message is None:
+            message = event + " " + str(fields)
+            level = logging.DEBUG
+        if self.verbose and level >= logging.INFO:
+            print(message)
+        if logger.isEnabledFor(level):
+            logger.log(level, message, extra = {"event": event, "fields": fields})
+
+
+    def _phase_done(self, phase, start):
+        # Reports the time spent in a phase since start (from time.perf_counter)
+        self._emit("phase", phase = phase, seconds = time.perf_counter() - start)
+
+
+    def iter_instances(self, prefetch = 2, **filters):
+        # Generator with the same filters as get_instances, which yields each instance as soon as its file
+        # is ready while the files of the next prefetch instances are downloaded in the background
+        assert prefetch >= 0 # The look-ahead cannot be negative
+        instance_list, downloads = self._select_instances(**filters)
+        pending = {id(args[0]): args for args in downloads}
+
+        executor = ThreadPoolExecutor(max_workers = max(prefetch, 1))
+        futures = []
+        try:
+            for position, instance in enumerate(instance_list):
+                while len(futures) < len(instance_list) and len(futures) <= position + prefetch:
+                    args = pending.get(id(instance_list[len(futures)]))
+                    futures.append(executor.submit(self._fetch, *args) if args is not None else None)
+                if futures[position] is not None:
+                    futures[position].result()
+                    futures[position] = None
+                yield instance
+        finally:
+            # Stops prefetching if the consumer stops iterating; downloads already running are completed
+            for future in futures:
+                if future is not None:
+                    future.cancel()
+            executor.shutdown(wait = False)
+
+
+    def _select_instances(self, instance_name = None, min_var = None, max_var = None, min_bin = None, max_bin = None, min_int = None, max_int = None, min_cont = None, max_cont = None, min_cons = None, max_cons = None, min_nz = None, max_nz = None, with_status = None, without_status = None, min_sos = None, max_sos = None, min_semi = None, max_semi = None, problem_type = None, min_obj_density = None, max_obj_density = None, min_problematic_ev_density = None, max_problematic_ev_density = None, min_quadratic_cons = None, max_quadratic_cons = None, objective_type = None, variables_type = None, constraints_type = None, tags = None, **features):
         # Status can only be "easy", "hard", or "open" (MIPLIB) and "open" or "closed" (MINLPLIB)
 
-        data = pd.read_csv(self.instances_cvs_path, dtype={'Instance': str})
-        df = pd.DataFrame(data)
+        # An instance looked up by name alone does not need the catalog to be loaded
+        filters = [value for key, value in locals().items() if key not in ["self", "instance_name", "features"]]
+
+        # The other keyword arguments can only be filters on the computed features, so that a misspelled filter is an error
+        for key in features:
+            if key[:4] not in ["min_", "max_"] or key[4:] not in models.FEATURES:
+                raise TypeError("Unexpected keyword argument '" + key + "' (the filters of computed features are min_<feature> and max_<feature>)")
+
+        if instance_name is not None and not features and all(value is None for value in filters):
+            selection = self._select_by_name(instance_name)
+            if selection is not None:
+                return selection
+
+        self._load_catalog()
+        start = time.perf_counter()
+        columns = self.catalog_columns
+        index = self.catalog_index
+        conditions = []
 
         if instance_name is not None:
-            df = df[df['Instance'] == instance_name]
-
-        if min_var is not None:
-            df = df[df['Variables'] >= min_var]
-        if max_var is not None:
-            df = df[df['Variables'] <= max_var]
-
-        if min_bin is not None:
-            df = df[df['Binaries'] >= min_bin]
-        if max_bin is not None:
-            df = df[df['Binaries'] <= max_bin]
-
-        if min_int is not None:
-            df = df[df['Integers'] >= min_int]
-        if max_int is not None:
-            df = df[df['Integers'] <= max_int]
-
-        if min_cont is not None:
-            df = df[df['Continuous'] >= min_cont]
-        if max_cont is not None:
-            df = df[df['Continuous'] <= max_cont]
-
-        if min_cons is not None:
-            df = df[df['Constraints'] >= min_cons]
-        if max_cons is not None:
-            df = df[df['Constraints'] <= max_cons]
-
-        if min_nz is not None:
-            df = df[df['Nonz.'] >= min_nz]
-        if max_nz is not None:
-            df = df[df['Nonz.'] <= max_nz]
+            conditions.append(columns['Instance'] == instance_name)
+
+        if min_var is not None or max_var is not None:
+            conditions.append(index.range('Variables', min_var, max_var))
+
+        if min_bin is not None or max_bin is not None:
+            conditions.append(index.range('Binaries', min_bin, max_bin))
+
+        if min_int is not None or max_int is not None:
+            conditions.append(index.range('Integers', min_int, max_int))
+
+        if min_cont is not None or max_cont is not None:
+            conditions.append(index.range('Continuous', min_cont, max_cont))
+
+        if min_cons is not None or max_cons is not None:
+            conditions.append(index.range('Constraints', min_cons, max_cons))
+
+        if min_nz is not None or max_nz is not None:
+            conditions.append(index.range('Nonz.', min_nz, max_nz))
 
         if with_status is not None:
             assert self.library != Libraries.QPLIB # Cannot filter QPLIB by status
             assert not ( with_status.name == "closed" and self.library in [Libraries.MIPLIB2017_Benchmark, Libraries.MIPLIB2017_Collection])  # Status closed only applies to MINLPLIB
             assert not ( with_status.name in ["easy","hard"] and self.library == Libraries.MINLPLIB ) # Status easy and hard only applies to MIPLIB2017
-            df = df[df['Status'] == with_status.name]
+            conditions.append(columns['Status'] == with_status.name)
         if without_status is not None:
             assert self.library != Libraries.QPLIB # Cannot filter QPLIB by status
             assert not ( without_status.name == "closed" and self.library in [Libraries.MIPLIB2017_Benchmark, Libraries.MIPLIB2017_Collection])  # Status closed only applies to MINLPLIB
             assert not ( without_status.name in ["easy","hard"] and self.library == Libraries.MINLPLIB ) # Status easy and hard only applies to MIPLIB2017
-            df = df[df['Status'] != without_status.name]
+            conditions.append(columns['Status'] != without_status.name)
 
-        if min_sos is not None:
-            assert self.library == Libraries.MINLPLIB # Can only filter by SOS in MINLPLIB
-            df = df[df['SOS'] >= min_sos]
-        if max_sos is not None:
+        if min_sos is not None or max_sos is not None:
             assert self.library == Libraries.MINLPLIB # Can only filter by SOS in MINLPLIB
-            df = df[df['SOS'] <= max_sos]
+            conditions.append(index.range('SOS', min_sos, max_sos))
 
-        if min_semi is not None:
-            assert self.library == Libraries.MINLPLIB # Can only filter by Semi in MINLPLIB
-            df = df[df['Semi'] >= min_semi]
-        if max_semi is not None:
+        if min_semi is not None or max_semi is not None:
             assert self.library == Libraries.MINLPLIB # Can only filter by Semi in MINLPLIB
-            df = df[df['Semi'] <= max_semi]
+            conditions.append(index.range('Semi', min_semi, max_semi))
 
         if problem_type is not None:
             assert self.library == Libraries.MINLPLIB # Can only filter by problem type in MINLPLIB
-            df = df[df['Type'] == problem_type]
+            conditions.append(columns['Type'] == problem_type)
 
-        if min_obj_density is not None:
+        if min_obj_density is not None or max_obj_density is not None:
             assert self.library == Libraries.QPLIB # Can only filter by objective density in QPLIB
-            df = df[df['Q0density'] >= min_obj_density]
-
-        if max_obj_density is not None:
-            assert self.library == Libraries.QPLIB # Can only filter by objective density in QPLIB
-            df = df[df['Q0density'] <= max_obj_density]
-
-        if min_problematic_ev_density is not None:
-            assert self.library == Libraries.QPLIB # Can only filter by problematic eigenvalues in QPLIB
-            df = df[df['Q0probl.ev'] >= min_problematic_ev_density]
+            conditions.append(index.range('Q0density', min_obj_density, max_obj_density))
 
-        if max_problematic_ev_density is not None:
+        if min_problematic_ev_density is not None or max_problematic_ev_density is not None:
             assert self.library == Libraries.QPLIB # Can only filter by problematic eigenvalues in QPLIB
-            df = df[df['Q0probl.ev'] <= max_problematic_ev_density]
-
-        if min_quadratic_cons is not None:
-            assert self.library == Libraries.QPLIB # Can only filter by quadratic constraints in QPLIB
-            df = df[df['Quadratic constraints'] >= min_quadratic_cons]
+            conditions.append(index.range('Q0probl.ev', min_problematic_ev_density, max_problematic_ev_density))
 
-        if max_quadratic_cons is not None:
+        if min_quadratic_cons is not None or max_quadratic_cons is not None:
             assert self.library == Libraries.QPLIB # Can only filter by quadratic constraints in QPLIB
-            df = df[df['Quadratic constraints'] <= max_quadratic_cons]
+            conditions.append(index.range('Quadratic constraints', min_quadratic_cons, max_quadratic_cons))
 
         if objective_type is not None:
             assert self.library == Libraries.QPLIB # Can only filter by objective type in QPLIB
-            df = df[df['Objective type'] == objective_type]
+            conditions.append(columns['Objective type'] == objective_type)
 
         if variables_type is not None:
             assert self.library == Libraries.QPLIB # Can only filter by variables type in QPLIB
-            df = df[df['Variables type'] == variables_type]
+            conditions.append(columns['Variables type'] == variables_type)
 
         if constraints_type is not None:
             assert self.library == Libraries.QPLIB # Can only filter by constraints type in QPLIB
-            df = df[df['Constraints type'] == constraints_type]
+            conditions.append(columns['Constraints type'] == constraints_type)
 
         if tags is not None:
            assert self.library in [Libraries.MIPLIB2017_Benchmark, Libraries.MIPLIB2017_Collection] # Can only filter by constraints type in MIPLIB2017
            assert isinstance(tags, list) # the tags must be a list, to enable filtering on multiple tags
            for t in tags:
                if t[0] == '~':
-                   df = df[~df['Tags'].str.contains(t[1:])]
+                   conditions.append(~index.tag(t[1:]))
                else:
-                   df = df[df['Tags'].str.contains(t)]
+                   conditions.append(index.tag(t))
+
+        # Computed features (see compute_features) are filtered by min_<feature> and max_<feature>
+        for key, value in features.items():
+            bound, feature = key[:3], key[4:]
+            if value is not None:
+                assert feature in index.sorted # Features should be computed first
+                conditions.append(index.range(feature, value if bound == "min" else None, value if bound == "max" else None))
+
+        # All filters are combined into a single mask over the catalog
+        if conditions:
+            selected = np.flatnonzero(np.logical_and.reduce(conditions))
+        else:
+            selected = range(len(self.catalog_rows))
+
+        instance_list = [Instance(*self.catalog_rows[i], cache=self.inflated_cache, library=self.library) for i in selected]
+        downloads = []
+        manifest = self._read_manifest()
+
+        for i, instance in zip(selected, instance_list):
+            if self._is_cached(instance.path, manifest):
+                self._emit("cache_hit", "Instance " + instance.name + ": Already downloaded", instance = instance.name)
+            else:
+                downloads.append((instance, self.catalog_urls[i], self.catalog_formats[i]))
+
+        self._phase_done("query", start)
+        return instance_list, downloads
+
+
+    def _select_by_name(self, instance_name):
+        # Same as _select_instances with the filter instance_name alone, from the rows of the catalog saved as
+        # JSON, which only needs the standard library; returns None if the saved rows are outdated
+        csv_mtime = os.stat(self.instances_cvs_path).st_mtime_ns
+        if self.catalog is not None and self.catalog_mtime == csv_mtime:
+            return None # The catalog is already loaded
+        if self.saved_rows is None or self.saved_rows_mtime != csv_mtime:
+            try:
+                with open(self.instances_rows_path) as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                return None
+            if saved.get("csv_mtime") != csv_mtime:
+                return None
+            self.saved_rows = saved["instances"]
+            self.saved_rows_mtime = csv_mtime
+        start = time.perf_counter()
 
         instance_list = []
+        downloads = []
+        manifest = self._read_manifest()
+        for row, url, formats in self.saved_rows.get(instance_name, []):
+            path = os.path.join(self.local_directory, self.local_file_prefix + instance_name + self.local_file_ext)
+            instance = Instance(row[0], row[1], path, *row[2:], cache=self.inflated_cache, library=self.library)
+            instance_list.append(instance)
+            if self._is_cached(path, manifest):
+                self._emit("cache_hit", "Instance " + instance.name + ": Already downloaded", instance = instance.name)
+            else:
+                downloads.append((instance, self.remote_directory + url + self.remote_file_ext, formats))
+
+        self._phase_done("query", start)
+        return instance_list, downloads
+
 
-        for index, row in df.iterrows():
-            instance = row['Instance']
-            url = self.remote_directory + instance + self.remote_file_ext
-            local = instance + self.remote_file_ext
-            final = os.path.join(self.local_directory, self.local_file_prefix + instance + self.local_file_ext)
+    def update_catalog(self):
+        # Downloads the data about the instances of the library again if it changed, and returns the names
+        # of the instances that were added, removed, or changed; the instance files are kept as they are.
+        # Only one process updates the csv file, while the others wait and then use it.
+        start = time.perf_counter()
+        csv_mtime = os.stat(self.instances_cvs_path).st_mtime_ns if os.path.isfile(self.instances_cvs_path) else None
+        with FileLock(lock_path(self.instances_cvs_path), self.lock_timeout):
+            if csv_mtime is None and os.path.isfile(self.instances_cvs_path):
+                self.catalog_changes = None # Built by another process in the meantime
+            else:
+                self._build_catalog()
+        self._phase_done("catalog_update", start)
+        return self.catalog_changes
+
+
+    def _read_catalog_meta(self):
+        # Validators (ETag and Last-Modified) of the pages the catalog comes from, and time of the last check
+        if not os.path.isfile(self.catalog_meta_path):
+            return {}
+        with open(self.catalog_meta_path) as f:
+            return json.load(f)
+
+
+    def _get_if_modified(self, url, meta, conditional):
+        # Content of url, or None if it did not change since the validators in meta were recorded
+        validators = meta.setdefault("validators", {}).get(url, {})
+        headers = {}
+        if conditional and "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if conditional and "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+        response = self.session.get(url, headers = headers, timeout = self.timeout)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        validators = {}
+        if "ETag" in response.headers:
+            validators["etag"] = response.headers["ETag"]
+        if "Last-Modified" in response.headers:
+            validators["last_modified"] = response.headers["Last-Modified"]
+        meta["validators"][url] = validators
+        return response.content
+
+
+    def _build_catalog(self):
+        # Builds the csv file from the pages of the library, requesting them only if they were modified
+        meta = self._read_catalog_meta()
+        old = None
+        if os.path.isfile(self.instances_cvs_path):
+            old = pd.read_csv(self.instances_cvs_path, dtype={'Instance': str})
+        page = self._get_if_modified(self.instances_url, meta, old is not None)
+        solutions = None
+        if self.library == Libraries.QPLIB:
+            solutions = self._get_if_modified(self.solution_values_url, meta, old is not None)
+        meta["checked"] = time.time()
+
+        if page is None and solutions is None:
+            self._emit("catalog_unchanged", "Instance data is up to date")
+            self.catalog_changes = {"added":[], "removed":[], "changed":[]}
+            write_json(self.catalog_meta_path, meta)
+            return
+
+        self._emit("catalog_download", "Downloading instance data to CSV file", url = self.instances_url)
+
+        if page is None:
+            df = old.drop(columns = [column for column in old.columns if column.startswith("Unnamed")])
+        else:
+            df = self._parse_instances_page(page)
 
-            if self.library != Libraries.QPLIB:
-                status = row['Status']
+        if self.library == Libraries.QPLIB:
+            if solutions is None: # Keeps the known solution values
+                df["Primal"] = df["Instance"].map(dict(zip(old["Instance"], old["Primal"])))
             else:
-                status = None
+                df["Primal"] = df["Instance"].map(parse_qplib_solutions(solutions)).astype(float)
+
+        temp = temporary_path(self.instances_cvs_path)
+        df.to_csv(temp, quoting=csv.QUOTE_NONNUMERIC)
 
-            primal = row['Primal']
+        # Compares the new catalog with the previous one, which is kept if nothing changed
+        if old is None:
+            self.catalog_changes = None
+        else:
+            self.catalog_changes = catalog_changes(old, pd.read_csv(temp, dtype={'Instance': str}))
+            counts = {key: len(names) for key, names in self.catalog_changes.items()}
+            self._emit("catalog_changes", "Instances added: " + str(counts["added"]) + " removed: " + str(counts["removed"]) + " changed: " + str(counts["changed"]), **counts)
 
-            if self.library == Libraries.MINLPLIB:
-                primal = float(primal)
-                dual = float(row['Dual'])
-                sos = int(row['SOS'])
-                semi = int(row['Semi'])
-                problem_type = row['Type']
+        if self.catalog_changes is not None and not any(self.catalog_changes.values()):
+            os.remove(temp)
+        else:
+            os.replace(temp, self.instances_cvs_path)
+        write_json(self.catalog_meta_path, meta)
+
+        # Writes the binary copy of the new catalog
+        self._load_catalog()
+
+
+    def _parse_instances_page(self, page):
+        # Table of instances from the HTML page of the library, with the columns named as in the csv file
+        df = read_first_table(page)
+        if df is None: # The table has a layout that only the full HTML parser handles
+            df = pd.read_html(io.BytesIO(page))[0]
+
+        if self.library == Libraries.MIPLIB2017_Benchmark or self.library == Libraries.MIPLIB2017_Collection:
+            df.rename(columns = {"Objective":"Primal"}, inplace = True)
+
+        elif self.library == Libraries.MINLPLIB:
+            df.rename(columns = {
+                 df.columns[0]:"Instance",    # Name
+                 df.columns[1]:"Formats",     # Formats(i)
+                 df.columns[2]:"Type",        # Type(i)
+                 df.columns[3]:"Convex",      # C(i)
+                 df.columns[4]:"Variables",   # #Vars(i)
+                 df.columns[5]:"Binaries",    # #BinVars(i)
+                 df.columns[6]:"Integers",    # #IntVars(i)
+                 df.columns[7]:"Constraints", # #Vars(i)
+                 df.columns[8]:"SOS",         # #SOS(i)
+                 df.columns[9]:"Semi",        # #Semi(i)
+                 df.columns[10]:"Nonz.",      # #NZ(i)
+                 df.columns[11]:"Status",     # S(i)
+                 df.columns[12]:"Dual",       # Dual Bound(i)
+                 df.columns[13]:"Primal",     # Primal Bound(i)
+                 df.columns[14]:"Points"      # Points(i)
+                }, inplace = True)
+            df.fillna({"Convex":"-","Binaries":0, "Integers":0, "SOS":0, "Semi":0, "Status":"-"}, inplace=True)
+            df["Continuous"] = df["Variables"] - df["Binaries"] - df["Integers"]
+            df["Convex"] = df["Convex"].replace({"-":"No", "✔":"Yes"})
+            df["Status"] = df["Status"].replace({"-":"open", "✔":"closed"})
+
+        elif self.library == Libraries.QPLIB:
+            df.drop(df.tail(1).index, inplace=True) # Removes last row (not an instance)
+            df["Format"] = df["Instance"].apply(parse_qplib_format)
+            df["Instance"] = df["Instance"].apply(parse_qplib_name)
+            df.rename(columns = {
+                         "Cvx":"Convex",
+                         "O":"Objective type",
+                         "V":"Variables type",
+                         "C":"Constraints type",
+                         "TotalVars.":"Variables",
+                         "BinaryVars.":"Binaries",
+                         "IntegerVars.":"Integers",
+                         "TotalCons.":"Constraints",
+                         "Quad.Cons.":"Quadratic constraints",
+                         "Non-zeros":"Nonz."
+                        }, inplace = True)
+            df.fillna({"Binaries":0, "Integers":0}, inplace=True)
+            df["Continuous"] = df["Variables"] - df["Binaries"] - df["Integers"]
+            df["Convex"] = df["Convex"].replace({"-":"No", "✔":"Yes"})
+
+        return df
+
+
+    def _load_catalog(self):
+        # Catalog of the library, kept in memory while the CSV file is unchanged. The CSV file is only parsed
+        # when its binary copy (one NumPy array per column) is missing or older than it. Computed features
+        # are added as extra columns.
+        csv_mtime = os.stat(self.instances_cvs_path).st_mtime_ns
+        features_mtime = os.stat(self.features_path).st_mtime_ns if os.path.isfile(self.features_path) else None
+        if self.catalog is not None and self.catalog_mtime == csv_mtime and self.features_mtime == features_mtime:
+            return self.catalog
+        start = time.perf_counter()
+
+        df = None
+        if os.path.isfile(self.instances_npz_path):
+            with np.load(self.instances_npz_path, allow_pickle = False) as data:
+                if int(data["csv_mtime"]) == csv_mtime:
+                    df = catalog_from_arrays(data)
+        if df is None:
+            df = pd.read_csv(self.instances_cvs_path, dtype={'Instance': str})
+            arrays = catalog_to_arrays(df)
+            arrays["csv_mtime"] = np.int64(csv_mtime)
+            temp = temporary_path(self.instances_npz_path)
+            with open(temp, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(temp, self.instances_npz_path)
+        if features_mtime is not None:
+            features = pd.read_csv(self.features_path, dtype={'Instance': str})
+            df = df.merge(features.drop(columns=['sha256']), on='Instance', how='left')
+
+        self.catalog = df
+        self.catalog_mtime = csv_mtime
+        self.features_mtime = features_mtime
+        self.catalog_columns = {column: df[column].to_numpy() for column in df.columns}
+        self.catalog_index = CatalogIndex(df)
+        self.catalog_rows = self._instance_rows(df)
+        self.catalog_urls = [self.remote_directory + instance + self.remote_file_ext for instance in df['Instance']]
+        if 'Formats' in df:
+            self.catalog_formats = df['Formats'].tolist()
+        elif 'Format' in df:
+            self.catalog_formats = df['Format'].tolist()
+        else:
+            self.catalog_formats = [None] * len(df)
+
+        # Rows saved for _select_by_name, without the paths and URLs, which depend on the options. They are only
+        # written when missing or outdated, as the processes sharing a cache all load the catalog.
+        if self._saved_rows_csv_mtime() != csv_mtime:
+            instances = {}
+            for row, instance, formats in zip(self.catalog_rows, df['Instance'], self.catalog_formats):
+                instances.setdefault(row[0], []).append([row[:2] + row[3:], instance, None if isinstance(formats, float) else formats])
+            temp = temporary_path(self.instances_rows_path)
+            with open(temp, 'w') as f:
+                json.dump({"csv_mtime":csv_mtime, "instances":instances}, f)
+            os.replace(temp, self.instances_rows_path)
+
+        self._phase_done("catalog_load", start)
+        return df
+
+
+    def _saved_rows_csv_mtime(self):
+        # Modification time of the CSV file the saved rows come from, or None if they cannot be read
+        try:
+            with open(self.instances_rows_path) as f:
+                return json.load(f).get("csv_mtime")
+        except (OSError, ValueError):
+            return None
+
+
+    def _instance_rows(self, df):
+        # Arguments of the Instance constructor for every row of the catalog, normalized column-wise
+        n = len(df)
+        names = df['Instance'].tolist()
+        paths = [os.path.join(self.local_directory, self.local_file_prefix + instance + self.local_file_ext) for instance in names]
+
+        if self.library != Libraries.QPLIB:
+            status = df['Status'].tolist()
+        else:
+            status = [None] * n
+
+        if self.library in [Libraries.MIPLIB2017_Benchmark, Libraries.MIPLIB2017_Collection]:
+            problem_type = ["MILP"] * n
+            dual = sos = semi = [None] * n
+
+            # Objective values come as strings, with a trailing asterisk if the problem is open, or as words
+            # if there is no objective value; empty cells have a nan
+            objective = df['Primal']
+            if pd.api.types.is_numeric_dtype(objective):
+                primal = objective.to_numpy(dtype=float)
+                feasible = np.where(np.isnan(primal), None, True)
             else:
-                if self.library in [Libraries.MIPLIB2017_Benchmark, Libraries.MIPLIB2017_Collection]:
-                    problem_type = "MILP"
-                else:
-                    problem_type = None
-                dual = None
-                sos = None
-                semi = None
-
-            if self.library in [Libraries.MIPLIB2017_Benchmark, Libraries.MIPLIB2017_Collection]:
-
-                if primal == "Infeasible" or primal == "NA":
-                    feasible = False
-                    primal = None
-                elif primal == "Unbounded":
-                    feasible = True
-                    primal = None
-                elif type(primal)==str: #Any numerical objective comes as a string
-                    feasible = True
-                    if status == "open": # Open problems have a trailing asterisk in the objective value
-                        primal = float(primal[:-1]) # Removes trailing asterisk from objective
-                    else: # Other problems have just the numerical value to be converted
-                        primal = float(primal)
-                elif math.isnan(primal): # Empty cells have a nan
-                    feasible = None
-                    primal = None
-                else:
-                    feasible = True
-                    assert type(primal)==float
-
-            elif self.library == Libraries.MINLPLIB:
-                if math.isnan(primal):
-                    primal = None
-                    if dual == float("inf"):
-                        feasible = False
+                objective = objective.astype(object)
+                infeasible = objective.isin(["Infeasible", "NA"]).to_numpy()
+                unbounded = (objective == "Unbounded").to_numpy()
+                missing = objective.isna().to_numpy()
+                numeric = ~(infeasible | unbounded | missing)
+                primal = np.full(n, np.nan)
+                primal[numeric] = objective[numeric].astype(str).str.rstrip("*").astype(float).to_numpy()
+                feasible = np.where(missing, None, ~infeasible)
+
+        elif self.library == Libraries.MINLPLIB:
+            problem_type = df['Type'].tolist()
+            primal = df['Primal'].to_numpy(dtype=float)
+            dual_bound = df['Dual'].to_numpy(dtype=float)
+            feasible = np.where(~np.isnan(primal), True, np.where(dual_bound == float("inf"), False, None))
+            dual = dual_bound.tolist()
+            sos = df['SOS'].astype(int).tolist()
+            semi = df['Semi'].astype(int).tolist()
+
+        else:
+            problem_type = dual = sos = semi = [None] * n
+            primal = df['Primal'].to_numpy(dtype=float)
+            feasible = np.where(np.isnan(primal), None, True)
+
+        primal = [None if math.isnan(value) else value for value in primal.tolist()]
+        feasible = feasible.tolist()
+
+        counts = [df[column].astype(int).tolist() for column in ['Variables', 'Binaries', 'Integers', 'Continuous', 'Constraints', 'Nonz.']]
+
+        if self.library == Libraries.QPLIB:
+            obj_density = df['Q0density'].astype(float).tolist()
+            problematic_ev_density = df['Q0probl.ev'].astype(float).tolist()
+            quadratic_cons = df['Quadratic constraints'].astype(int).tolist()
+            objective_type = df['Objective type'].tolist()
+            variables_type = df['Variables type'].tolist()
+            constraints_type = df['Constraints type'].tolist()
+        else:
+            obj_density = problematic_ev_density = quadratic_cons = objective_type = variables_type = constraints_type = [None] * n
+
+        return list(zip(names, problem_type, paths, feasible, primal, dual, status, *counts, sos, semi, obj_density, problematic_ev_density, quadratic_cons, objective_type, variables_type, constraints_type))
+
+
+    def _download_all(self, downloads, max_workers = None):
+        # Each download is a tuple (instance, url, formats), followed by the MIPLIBing object fetching it if it is
+        # not this one (see MIPLIBingFederation); instances whose file could not be fetched get path None. The
+        # manifest of each MIPLIBing object and the index of the shared store are written once at the end.
+        if max_workers is None:
+            max_workers = self.max_workers
+
+        owner = lambda args: args[3] if len(args) > 3 else self
+        batches = {owner(args): ({}, {}) for args in downloads}
+        fetch = lambda args: owner(args)._fetch(*args[:3], batch = batches[owner(args)])
+        start = time.perf_counter()
+        try:
+            if max_workers > 1 and len(downloads) > 1:
+                with ThreadPoolExecutor(max_workers = max_workers) as executor:
+                    list(executor.map(fetch, downloads))
+            else:
+                for args in downloads:
+                    fetch(args)
+        finally: # Also records the files fetched before an interruption
+            for member, batch in batches.items():
+                member._commit(batch)
+        if downloads:
+            self._phase_done("download", start)
+
+
+    def _fetch(self, instance, url, formats, batch = None):
+        # Downloads the file of an instance, whose path becomes None if that fails
+        if not self._download(instance.path, url, formats, batch):
+            instance.path = None
+
+
+    def _download(self, path, url, formats = None, batch = None):
+        # Fetches one file into path and records it in the manifest and the index of the shared store, or in
+        # batch (see _commit) if given; returns False if that failed. Only one process downloads a given file,
+        # while the others wait for it and then use its result, which may not be in the manifest yet.
+        name = self._instance_name(path)
+        start = time.perf_counter()
+
+        def record(entry, key = None):
+            # Manifest entry of the file, and index entry of the shared store if the file was stored
+            entries, index = batch if batch is not None else ({}, {})
+            entries[path] = dict(entry, url = url)
+            if key is not None:
+                index[key] = entry
+            if batch is None:
+                self._commit((entries, index))
+
+        with FileLock(lock_path(path), self.lock_timeout) as lock:
+            if os.path.isfile(path) and self._is_cached(path, self._read_manifest()):
+                self._emit("cache_hit", "Instance " + name + ": Downloaded by another process", instance = name)
+                return True
+
+            key = self._store_key(url)
+            entry = self.store.link(key, path)
+            if entry is not None: # Another library already fetched the same file
+                self._emit("store_link", "Instance " + name + ": Linked from shared store", instance = name, seconds = time.perf_counter() - start)
+                record(entry)
+                return True
+
+            member = self._snapshot_member(path)
+            if member is not None:
+                self._emit("snapshot_extract", "Instance " + name + ": Extracting from snapshot", instance = name)
+            else:
+                self._emit("download_start", "Instance " + name + ": Downloading from " + url, instance = name, url = url)
+
+            # The response is written (and inflated or compressed as needed) into a temporary file of the cache directory,
+            # which is renamed into place only when complete, so a partial file is never seen as downloaded
+            temp = temporary_path(path)
+            try:
+                with open(temp, 'xb') as f_out:
+                    if member is not None:
+                        self.snapshot.copy(member, f_out)
+                        entry = {key: value for key, value in self.snapshot.entries[member].items() if key != "url"}
                     else:
-                        feasible = None
+                        size, digest, received = self._transfer(url, f_out, lock)
+                        entry = {"size":size, "sha256":digest, "fetched":time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+                self.store.put(temp, entry)
+                os.replace(temp, path)
+                record(entry, key)
+                if member is None:
+                    self._emit("download_done", instance = name, url = url, seconds = time.perf_counter() - start, bytes_received = received, bytes_written = size, inflated = self.codec is Inflater)
+                return True
+
+            except (requests.RequestException, OSError, EOFError, zlib.error, zipfile.BadZipFile) as error:
+                if formats is not None:
+                    message = "File " + url + " does not exist, but you can download in the following formats: " + str(formats)
+                else:
+                    message = "File " + url + " could not be downloaded"
+                self._emit("download_failed", message, logging.WARNING, instance = name, url = url, error = str(error), seconds = time.perf_counter() - start)
+                if os.path.isfile(temp):
+                    os.remove(temp)
+                return False
+
+
+    def _transfer(self, url, f_out, lock):
+        # Streams url through the codec of the cache into f_out and returns the size and SHA-256 of what was written.
+        # A dropped or stalled connection is resumed with an HTTP Range request from the last byte received, conditioned with
+        # If-Range on the ETag (or else the Last-Modified date) of the first response, so that the server sends the whole file
+        # again if it changed in the meantime. Without either, the download starts over. Also returns the number of bytes
+        # received over all attempts.
+        received = 0
+        total = 0
+        attempt = 0
+        validator = None
+        while True:
+            headers = {"Accept-Encoding":"identity"} # Byte offsets must refer to the file itself
+            if received > 0 and validator is not None:
+                headers["Range"] = "bytes=" + str(received) + "-"
+                headers["If-Range"] = validator
+            try:
+                with self.session.get(url, stream = True, headers = headers, timeout = self.timeout) as response:
+                    response.raise_for_status()
+                    if received == 0 or response.status_code != 206: # Start over unless the server resumes
+                        validator = response.headers.get("ETag")
+                        if validator is None or validator.startswith("W/"): # Weak ETags cannot be used in If-Range
+                            validator = response.headers.get("Last-Modified")
+                        f_out.seek(0)
+                        f_out.truncate()
+                        received = 0
+                        size = 0
+                        hasher = hashlib.sha256()
+                        codec = self.codec() if self.codec is not None else None
+
+                    for chunk in response.iter_content(chunk_size = 1 << 16):
+                        received += len(chunk)
+                        total += len(chunk)
+                        if codec is not None:
+                            chunk = codec.process(chunk)
+                        f_out.write(chunk)
+                        hasher.update(chunk)
+                        size += len(chunk)
+                        lock.refresh()
+
+                    if codec is not None:
+                        chunk = codec.finish()
+                        f_out.write(chunk)
+                        hasher.update(chunk)
+                        size += len(chunk)
+                    return size, hasher.hexdigest(), total
+
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                if received > 0:
+                    message = "Connection to " + url + " dropped after " + str(received) + " bytes, resuming"
                 else:
-                    feasible = True
+                    message = "Connection to " + url + " failed, retrying"
+                self._emit("download_retry", message, logging.WARNING, url = url, bytes_received = received, attempt = attempt)
+                time.sleep(attempt)
+
 
-            elif self.library == Libraries.QPLIB:
-                if math.isnan(primal):
-                    primal = None
-                    feasible = None
+    def _snapshot_member(self, path):
+        # Name of the member of the snapshot holding the file at path, or None
+        if self.snapshot is None:
+            return None
+        member = self.library.name + "/" + os.path.basename(path)
+        return member if member in self.snapshot.entries and member in self.snapshot.names else None
+
+
+    def _catalog_paths(self):
+        # Files describing the catalog, which are packed in snapshots if they exist
+        return [self.instances_cvs_path, self.catalog_meta_path, self.features_path]
+
+
+    def _extract_catalog(self, snapshot):
+        # Extracts the catalog files of the library from a snapshot; returns False if it has no catalog
+        self._emit("snapshot_catalog", "Extracting catalog from " + snapshot.path, path = snapshot.path)
+        found = False
+        for path in self._catalog_paths():
+            found = snapshot.extract(self.library.name + "/" + os.path.basename(path), path) or found
+        return found
+
+
+    def export_snapshot(self, path, instances = None, append = False):
+        # Packs the catalog and the cached files of instances (by default, all cached files) into a zip archive
+        # at path, or adds them to it if append is True, so as to pack several libraries. Gzipped files are
+        # stored as they are and other files are deflated. Returns the number of instance files packed.
+        manifest = self._read_manifest()
+        if instances is None:
+            paths = [os.path.join(self.local_directory, name) for name in sorted(manifest)]
+        else:
+            assert all(instance.library in [None, self.library] for instance in instances) # Instances should belong to the library
+            paths = [instance.path for instance in instances if instance.path is not None]
+        paths = [file_path for file_path in paths if os.path.isfile(file_path) and os.path.basename(file_path) in manifest]
+        entries = {os.path.basename(file_path): manifest[os.path.basename(file_path)] for file_path in paths}
+        prefix = self.library.name + "/"
+
+        temp = path if append else temporary_path(path)
+        try:
+            with zipfile.ZipFile(temp, 'a' if append else 'x', zipfile.ZIP_DEFLATED, allowZip64 = True) as archive:
+                assert prefix + "manifest.json" not in archive.namelist() # The library is already in the snapshot
+                for file_path in self._catalog_paths():
+                    if os.path.isfile(file_path):
+                        archive.write(file_path, prefix + os.path.basename(file_path))
+                archive.writestr(prefix + "manifest.json", json.dumps(entries))
+                for file_path in paths:
+                    self._emit("snapshot_pack", "Instance " + self._instance_name(file_path) + ": Packing into snapshot", instance = self._instance_name(file_path))
+                    archive.write(file_path, prefix + os.path.basename(file_path), compress_type = zipfile.ZIP_STORED if file_path.endswith(".gz") else zipfile.ZIP_DEFLATED)
+            if not append:
+                os.replace(temp, path)
+        finally:
+            if not append and os.path.isfile(temp):
+                os.remove(temp)
+        return len(paths)
+
+
+    def import_snapshot(self, path):
+        # Extracts the catalog and all the instance files of the library from a snapshot into the cache.
+        # Returns the number of instance files extracted. See also the function import_snapshot, which
+        # does not need the catalog to be in the cache already.
+        snapshot = Snapshot(path)
+        found = self._extract_catalog(snapshot)
+        if not found:
+            raise ValueError("Snapshot " + path + " does not contain library " + self.library.name)
+        prefix = self.library.name + "/"
+        entries = {}
+        for member, entry in snapshot.entries.items():
+            if member.startswith(prefix) and member in snapshot.names:
+                file_path = os.path.join(self.local_directory, member[len(prefix):])
+                self._emit("snapshot_import", "Instance " + self._instance_name(file_path) + ": Extracting from snapshot", instance = self._instance_name(file_path))
+                with FileLock(lock_path(file_path), self.lock_timeout):
+                    snapshot.extract(member, file_path)
+                entries[os.path.basename(file_path)] = entry
+        with FileLock(lock_path(self.manifest_path), self.lock_timeout):
+            manifest = self._read_manifest()
+            manifest.update(entries)
+            write_json(self.manifest_path, manifest)
+        return len(entries)
+
+
+    def _store_key(self, url):
+        # Files in the shared store are identified by their source and by how they were transformed
+        return url + "#" + (self.codec.__name__ if self.codec is not None else "raw")
+
+
+    def _instance_name(self, path):
+        # Instance name from the name of its local file
+        name = os.path.basename(path)
+        return name[len(self.local_file_prefix):len(name)-len(self.local_file_ext)]
+
+
+    def _read_manifest(self):
+        # Maps each cached file name to its size, SHA-256, source URL and fetch time (UTC)
+        if not os.path.isfile(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+
+    def _commit(self, batch):
+        # Writes the entries collected by _download, a pair of dicts with the entries of the manifest by path
+        # and those of the index of the shared store by key
+        entries, index = batch
+        if entries:
+            self._record(entries)
+        if index:
+            self.store.add(index)
+
+
+    def _record(self, entries):
+        # Adds cached files to the manifest (or removes those whose entry is None), given by path, in one write
+        with FileLock(lock_path(self.manifest_path), self.lock_timeout):
+            manifest = self._read_manifest()
+            for path, entry in entries.items():
+                if entry is None:
+                    manifest.pop(os.path.basename(path), None)
                 else:
-                    feasible = True
-
-            nb_var = int(row['Variables'])
-            nb_bin = int(row['Binaries'])
-            nb_int = int(row['Integers'])
-            nb_cont = int(row['Continuous'])
-            nb_const = int(row['Constraints'])
-            nb_nz= int(row['Nonz.'])
-
-            if self.library == Libraries.QPLIB:
-                obj_density = float(row['Q0density'])
-                problematic_ev_density = float(row['Q0probl.ev'])
-                quadratic_cons = int(row['Quadratic constraints'])
-                objective_type = row['Objective type']
-                variables_type = row['Variables type']
-                constraints_type = row['Constraints type']
+                    manifest[os.path.basename(path)] = entry
+            write_json(self.manifest_path, manifest)
+
+
+    def _is_cached(self, path, manifest):
+        # A cached file must exist and, if the manifest knows it, have the recorded size
+        if not os.path.isfile(path):
+            return False
+        entry = manifest.get(os.path.basename(path))
+        return entry is None or entry["size"] == os.path.getsize(path)
+
+
+    def verify_cache(self, max_workers = None):
+        # Re-hashes every instance file in the cache in parallel and downloads again those that are
+        # missing, truncated, or corrupt; files not in the manifest yet are added to it as they are.
+        # Returns the names of the instances that were found to be invalid.
+        start = time.perf_counter()
+        manifest = self._read_manifest()
+        names = set(manifest)
+        for name in os.listdir(self.local_directory):
+            if name.startswith(self.local_file_prefix) and name.endswith(self.local_file_ext) and not name.startswith("."):
+                names.add(name)
+        names = sorted(names)
+        paths = [os.path.join(self.local_directory, name) for name in names]
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers = max_workers) as executor:
+            digests = list(executor.map(file_digest, paths, chunksize = 8))
+
+        invalid = []
+        untracked = {}
+        for name, path, digest in zip(names, paths, digests):
+            entry = manifest.get(name)
+            if entry is None:
+                url = self.remote_directory + self._instance_name(path) + self.remote_file_ext
+                untracked[path] = {"size":digest[0], "sha256":digest[1], "url":url, "fetched":None}
+            elif digest is None or digest[0] != entry["size"] or digest[1] != entry["sha256"]:
+                self._emit("invalid_file", "Instance " + self._instance_name(path) + ": Invalid file in cache", logging.WARNING, instance = self._instance_name(path))
+                invalid.append((path, entry["url"]))
+        if untracked:
+            self._record(untracked)
+
+        batch = ({}, {})
+        def download(args):
+            path, url = args
+            if os.path.isfile(path):
+                os.remove(path)
+            self.store.discard(self._store_key(url)) # The stored copy is the same file when it is linked, and may be corrupt too
+            if not self._download(path, url, batch = batch):
+                batch[0][path] = None
+
+        if invalid:
+            try:
+                with ThreadPoolExecutor(max_workers = max_workers or self.max_workers) as executor:
+                    list(executor.map(download, invalid))
+            finally:
+                self._commit(batch)
+
+        self._phase_done("verify", start)
+        return [self._instance_name(path) for path, url in invalid]
+
+
+    def compute_features(self, max_workers = None):
+        # Computes the structural features (see models.FEATURES) of the cached instance files in parallel and
+        # stores them in a CSV file next to the catalog, keyed by instance and SHA-256 of the file, so that
+        # only new or changed files are parsed again. Features are NaN for files that cannot be parsed.
+        # Returns the features as a DataFrame.
+        manifest = self._read_manifest()
+        if os.path.isfile(self.features_path):
+            previous = pd.read_csv(self.features_path, dtype={'Instance': str})
+        else:
+            previous = pd.DataFrame(columns=['Instance', 'sha256'] + models.FEATURES)
+        known = dict(zip(previous['Instance'], previous['sha256']))
+
+        names = []
+        paths = []
+        for name, entry in sorted(manifest.items()):
+            path = os.path.join(self.local_directory, name)
+            instance = self._instance_name(path)
+            if os.path.isfile(path) and known.get(instance) != entry["sha256"]:
+                names.append(instance)
+                paths.append(path)
+        self._emit("features_start", "Computing features of " + str(len(paths)) + " instance files", count = len(paths))
+        start = time.perf_counter()
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers = max_workers) as executor:
+            results = list(executor.map(models.file_features, paths))
+
+        rows = []
+        for name, path, result in zip(names, paths, results):
+            if result is None:
+                self._emit("features_unsupported", "Instance " + name + ": Features cannot be computed, as the file format is not supported or the file cannot be parsed", instance = name)
+            rows.append(dict(Instance=name, sha256=manifest[os.path.basename(path)]["sha256"], **(result or {})))
+
+        with FileLock(lock_path(self.features_path), self.lock_timeout):
+            if os.path.isfile(self.features_path): # Another process may have added features meanwhile
+                previous = pd.read_csv(self.features_path, dtype={'Instance': str})
+            if rows:
+                computed = pd.DataFrame(rows, columns=['Instance', 'sha256'] + models.FEATURES)
+                previous = previous[~previous['Instance'].isin(computed['Instance'])]
+                previous = pd.concat([previous, computed], ignore_index=True) if len(previous) else computed
+                temp = temporary_path(self.features_path)
+                previous.sort_values('Instance').to_csv(temp, index=False)
+                os.replace(temp, self.features_path)
+
+        self._phase_done("features", start)
+        return previous.sort_values('Instance', ignore_index=True)
+
+
+def import_snapshot(path, local_directory = "MIPLIBing_cache", libraries = None, **options):
+    # Extracts the catalogs and instance files of libraries (by default, all of those in the snapshot) from a
+    # snapshot into the cache at local_directory. The catalogs come from the snapshot, so this works without
+    # internet access even if the cache is empty. Other options are those of MIPLIBing. Returns the number of
+    # instance files extracted for each library.
+    snapshot = Snapshot(path)
+    contained = [library for library in Libraries if library.name + "/manifest.json" in snapshot.names]
+    if libraries is None:
+        libraries = contained
+    for library in libraries:
+        if library not in contained:
+            raise ValueError("Snapshot " + path + " does not contain library " + library.name)
+    counts = {}
+    for library in libraries:
+        mip = MIPLIBing(library, local_directory = local_directory, snapshot = path, **options) # Extracts the catalog if missing
+        counts[library] = mip.import_snapshot(path)
+    return counts
+
+
+class MIPLIBingFederation:
+    # Single catalog over several libraries with the columns they have in common, queried in one pass. An
+    # instance of several libraries (with the same download URL) is returned once, from the first of them in
+    # the order of libraries. The downloads of all libraries share one pool of workers and one HTTP session.
+
+    COLUMNS = ['Library', 'Instance', 'Type', 'Variables', 'Binaries', 'Integers', 'Continuous', 'Constraints', 'Nonz.', 'Primal', 'Status']
+
+    def __init__(self, libraries = None, update_csv = False, verbose = False, local_directory = "MIPLIBing_cache", max_workers = 1, **options):
+        if libraries is None:
+            libraries = list(Libraries)
+        assert all(type(library)==Libraries for library in libraries) # Libraries should belong to the enumeration
+        assert len(set(libraries)) == len(libraries) # Each library can only be given once
+        assert max_workers >= 1 # At least one download should run at a time
+        self.verbose = verbose
+        self.max_workers = max_workers
+        self.libraries = list(libraries)
+
+        # Other options (retries, compressed_cache, ...) are those of MIPLIBing; each library uses its default file extension
+        self.members = [MIPLIBing(library, update_csv, verbose, local_directory, max_workers = max_workers, **options) for library in self.libraries]
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections = 4, pool_maxsize = max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        for member in self.members:
+            member.session = self.session
+
+        self.catalog = None
+        self.catalog_mtimes = None
+        self.catalog_columns = None
+        self.catalog_index = None
+        self.catalog_members = None
+        self.catalog_positions = None
+
+
+    def get_instances(self, libraries = None, instance_name = None, min_var = None, max_var = None, min_bin = None, max_bin = None, min_int = None, max_int = None, min_cont = None, max_cont = None, min_cons = None, max_cons = None, min_nz = None, max_nz = None, with_status = None, without_status = None, max_workers = None, return_summary = False):
+        # Status can only be "easy", "hard", or "open" (MIPLIB) and "open" or "closed" (MINLPLIB); QPLIB has no status
+
+        # The events of all libraries during the call are recorded in one summary
+        summary = Summary()
+        for member in self.members:
+            member.summaries.append(summary)
+        try:
+            instance_list, downloads = self._select_instances(libraries, instance_name, min_var, max_var, min_bin, max_bin, min_int, max_int, min_cont, max_cont, min_cons, max_cons, min_nz, max_nz, with_status, without_status)
+
+            # Missing files of all libraries are fetched by one pool of workers
+            self.members[0]._download_all(downloads, max_workers if max_workers is not None else self.max_workers)
+        finally:
+            for member in self.members:
+                member.summaries.remove(summary)
+
+        if return_summary:
+            return instance_list, summary
+        return instance_list
+
+
+    def _select_instances(self, libraries = None, instance_name = None, min_var = None, max_var = None, min_bin = None, max_bin = None, min_int = None, max_int = None, min_cont = None, max_cont = None, min_cons = None, max_cons = None, min_nz = None, max_nz = None, with_status = None, without_status = None):
+        # Instances matching the filters, and the downloads of their missing files (see MIPLIBing._download_all)
+        self._load_catalog()
+        start = time.perf_counter()
+        columns = self.catalog_columns
+        index = self.catalog_index
+        conditions = []
+
+        if libraries is not None:
+            assert all(library in self.libraries for library in libraries) # Libraries should be part of the federation
+            conditions.append(np.isin(columns['Library'], [library.name for library in libraries]))
+
+        if instance_name is not None:
+            conditions.append(columns['Instance'] == instance_name)
+
+        for column, low, high in [('Variables', min_var, max_var), ('Binaries', min_bin, max_bin), ('Integers', min_int, max_int), ('Continuous', min_cont, max_cont), ('Constraints', min_cons, max_cons), ('Nonz.', min_nz, max_nz)]:
+            if low is not None or high is not None:
+                conditions.append(index.range(column, low, high))
+
+        if with_status is not None:
+            conditions.append(columns['Status'] == with_status.name)
+        if without_status is not None:
+            conditions.append(columns['Status'] != without_status.name)
+
+        if conditions:
+            selected = np.flatnonzero(np.logical_and.reduce(conditions))
+        else:
+            selected = range(len(self.catalog))
+
+        # Rows are ordered by library, so the first row with a given URL is the one to keep
+        instance_list = []
+        downloads = []
+        seen = set()
+        manifests = {}
+        for i in selected:
+            member = self.members[self.catalog_members[i]]
+            position = self.catalog_positions[i]
+            url = member.catalog_urls[position]
+            if url in seen:
+                continue
+            seen.add(url)
+            instance = Instance(*member.catalog_rows[position], cache=member.inflated_cache, library=member.library)
+            instance_list.append(instance)
+            if member.library not in manifests:
+                manifests[member.library] = member._read_manifest()
+            if member._is_cached(instance.path, manifests[member.library]):
+                member._emit("cache_hit", "Instance " + instance.name + ": Already downloaded", instance = instance.name)
             else:
-                obj_density = None
-                problematic_ev_density = None
-                quadratic_cons = None
-                objective_type = None
-                variables_type = None
-                constraints_type = None
-
-            new_instance = Instance(instance,problem_type,final,feasible,primal,dual,status,nb_var,nb_bin,nb_int,nb_cont,nb_const,nb_nz,sos=sos,semi=semi,obj_density=obj_density,problematic_ev_density=problematic_ev_density,quadratic_cons=quadratic_cons,objective_type=objective_type,variables_type=variables_type,constraints_type=constraints_type)
-            instance_list.append(new_instance)
-
-            if self.verbose:
-                print("Instance",instance,end=": ")
-
-            if os.path.isfile(final):
-                if self.verbose:
-                    print("Already downloaded")
+                downloads.append((instance, url, member.catalog_formats[position], member))
+
+        self.members[0]._phase_done("query", start)
+        return instance_list, downloads
+
+
+    def _load_catalog(self):
+        # Catalogs of all libraries with the columns of COLUMNS, rebuilt only when one of them changed
+        for member in self.members:
+            member._load_catalog()
+        mtimes = [(member.catalog_mtime, member.features_mtime) for member in self.members]
+        if self.catalog is not None and self.catalog_mtimes == mtimes:
+            return self.catalog
+
+        frames = []
+        for k, member in enumerate(self.members):
+            # Normalized values of the Instance constructor: name, problem type, path, feasible, primal, dual, status, counts, ...
+            rows = list(zip(*member.catalog_rows)) if member.catalog_rows else [()] * 21
+            if member.library == Libraries.QPLIB: # Three-letter code of the problem type
+                problem_type = [o + v + c for o, v, c in zip(rows[18], rows[19], rows[20])]
             else:
-                if self.verbose:
-                    print("Downloading from",url)
-                try:
-                    url_req.urlretrieve(url, local)
-                except HTTPError:
-                    if self.verbose:
-                        print("File",url,"does not exist, but you can download in the following formats:",row['Formats'])
-                    final = None
-                    new_instance.path = None
-
-                if self.library in [Libraries.MIPLIB2017_Benchmark,Libraries.MIPLIB2017_Collection]:
-                    with gz.open(local, 'rb') as f_in:
-                        with open(final, 'wb') as f_out:
-                            shu.copyfileobj(f_in, f_out)
-                    os.remove(local)  # Removes downloaded mps.gz file after unzipping it
-
-                elif final is not None:
-                    shu.move(local, final)
-
-        return instance_list
+                problem_type = list(rows[1])
+            frames.append(pd.DataFrame({
+                'Library': member.library.name,
+                'Instance': list(rows[0]),
+                'Type': problem_type,
+                'Variables': np.array(rows[7], dtype=float),
+                'Binaries': np.array(rows[8], dtype=float),
+                'Integers': np.array(rows[9], dtype=float),
+                'Continuous': np.array(rows[10], dtype=float),
+                'Constraints': np.array(rows[11], dtype=float),
+                'Nonz.': np.array(rows[12], dtype=float),
+                'Primal': np.array([np.nan if value is None else value for value in rows[4]], dtype=float),
+                'Status': list(rows[6]),
+                'member': k,
+                'position': np.arange(len(member.catalog_rows)),
+            }))
+        df = pd.concat(frames, ignore_index=True)
+
+        self.catalog_members = df.pop('member').to_numpy()
+        self.catalog_positions = df.pop('position').to_numpy()
+        self.catalog = df
+        self.catalog_mtimes = mtimes
+        self.catalog_columns = {column: df[column].to_numpy() for column in df.columns}
+        self.catalog_index = CatalogIndex(df)
+        return df
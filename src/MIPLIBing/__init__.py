@@ -1 +1 @@
-from .MIPLIBing import MIPLIBing, Libraries, Status
+from .MIPLIBing import MIPLIBing, MIPLIBingFederation, Libraries, Status, import_snapshot
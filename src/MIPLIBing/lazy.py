@@ -0,0 +1,16 @@
+import importlib
+
+
+class LazyModule:
+    # Module imported on first use of one of its attributes, which then replaces this object as the
+    # global name of the importing module, so that packages that are not needed are never imported
+
+    def __init__(self, name, namespace, alias):
+        self.name = name
+        self.namespace = namespace
+        self.alias = alias
+
+    def __getattr__(self, attribute):
+        module = importlib.import_module(self.name)
+        self.namespace[self.alias] = module
+        return getattr(module, attribute)
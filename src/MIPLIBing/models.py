@@ -0,0 +1,523 @@
+import gzip as gz
+import itertools
+import json
+import os
+import shutil as shu
+import uuid
+from array import array
+
+from .lazy import LazyModule
+
+np = LazyModule("numpy", globals(), "np") # Imported when a model is first parsed or loaded
+
+
+# Version of the layout of parsed models in the cache, which is parsed again if it changes
+MODEL_CACHE_VERSION = 2
+
+INFINITY = 1e30 # Bounds and right-hand sides at least this large are infinite
+
+
+class Model:
+    # Optimization model as NumPy arrays: the constraint matrix A is in CSR format (A_indptr, A_indices,
+    # A_data), the constraints are row_lower <= Ax <= row_upper with senses row_sense (b"E", b"L", or b"G",
+    # and b"R" or b"N" for ranged or free rows of QPLIB files) and right-hand sides rhs, and the variables are col_lower <= x <= col_upper, with masks for the
+    # integer (including binary) and binary variables. The objective is objective x + objective_offset.
+
+    ARRAYS = ['objective', 'A_indptr', 'A_indices', 'A_data', 'row_sense', 'rhs', 'row_lower', 'row_upper', 'col_lower', 'col_upper', 'integer', 'binary', 'semicontinuous', 'row_names', 'col_names']
+
+    def __init__(self, name, sense, objective_offset, **arrays):
+        self.name = name
+        self.sense = sense # "min" or "max"
+        self.objective_offset = objective_offset
+        for key in self.ARRAYS:
+            setattr(self, key, arrays[key])
+
+    @property
+    def nb_var(self):
+        return len(self.col_lower)
+
+    @property
+    def nb_const(self):
+        return len(self.row_lower)
+
+    @property
+    def nb_nz(self):
+        return len(self.A_data)
+
+    def to_scipy(self):
+        # Constraint matrix as a scipy.sparse.csr_matrix (requires SciPy)
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.A_data, self.A_indices, self.A_indptr), shape = (self.nb_const, self.nb_var))
+
+    def __str__(self):
+        return ("Model:                 \t" + str(self.name) + " (" + self.sense + ")\n" +
+                "Variables:             \t" + str(self.nb_var) + "\t(" + str(int(self.binary.sum())) + " binary)\t (" + str(int(self.integer.sum() - self.binary.sum())) + " integer)\n" +
+                "Constraints:           \t" + str(self.nb_const) + "\n" +
+                "Non-zeroes:            \t" + str(self.nb_nz) + "\n")
+
+
+class QuadraticModel(Model):
+    # Model with quadratic terms: the objective is 0.5 x'Q0x + objective x + objective_offset and constraint i
+    # is row_lower[i] <= 0.5 x'Qix + A[i]x <= row_upper[i]. The lower triangles of Q0 and of the Qi are
+    # COO arrays: Q0_data[k] is the entry (Q0_rows[k], Q0_cols[k]) of Q0 and Qc_data[k] is the entry
+    # (Qc_rows[k], Qc_cols[k]) of Qi for i = Qc_cons[k].
+
+    ARRAYS = Model.ARRAYS + ['Q0_rows', 'Q0_cols', 'Q0_data', 'Qc_cons', 'Qc_rows', 'Qc_cols', 'Qc_data']
+
+    @property
+    def obj_density(self):
+        # Density (%) of the symmetric matrix Q0, as in the column Q0density of QPLIB
+        if self.nb_var == 0:
+            return 0.0
+        nonzero = np.asarray(self.Q0_data) != 0
+        diagonal = np.asarray(self.Q0_rows)[nonzero] == np.asarray(self.Q0_cols)[nonzero]
+        return 100.0 * (2 * len(diagonal) - int(diagonal.sum())) / self.nb_var ** 2
+
+    @property
+    def quadratic_cons(self):
+        return len(np.unique(self.Qc_cons))
+
+    def __str__(self):
+        return (Model.__str__(self) +
+                "Objective Density:     \t" + str(round(self.obj_density, 2)) + "% \n" +
+                "Quadratic constraints: \t" + str(self.quadratic_cons) + "\n")
+
+
+def open_instance(path):
+    # Binary file object for an instance file, which may be gzipped
+    if path.endswith(".gz"):
+        return gz.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def to_bound(token):
+    value = float(token)
+    if value >= INFINITY:
+        return np.inf
+    if value <= -INFINITY:
+        return -np.inf
+    return value
+
+
+def read_mps(path):
+    # Parses a (fixed or free) MPS file in a single pass over its lines. The sections RANGES, BOUNDS, and
+    # OBJSENSE are supported; sections for quadratic terms, SOS, and indicators are skipped.
+    name = None
+    sense = "min"
+    objective_row = None
+    free_rows = set()
+    row_index = {}
+    row_names = []
+    row_sense = []
+    col_names = []
+    integer = []
+    objective = array('d')
+    objective_offset = 0.0
+    col_ptr = array('q', [0]) # The COLUMNS section lists the entries of each column together (CSC order)
+    rows = array('q')
+    values = array('d')
+    rhs = None
+    ranges = {}
+    bounds = []
+    in_integer_block = False
+    section = None
+
+    with open_instance(path) as f:
+        for line in f:
+            if not line.strip() or line[0:1] == b"*":
+                continue
+
+            if line[0:1] not in (b" ", b"\t"): # Section header
+                tokens = line.split()
+                section = tokens[0].upper()
+                if section == b"NAME":
+                    name = tokens[1].decode() if len(tokens) > 1 else ""
+                elif section == b"OBJSENSE" and len(tokens) > 1:
+                    sense = "max" if tokens[1].upper() in (b"MAX", b"MAXIMIZE") else "min"
+                elif section == b"COLUMNS":
+                    rhs = np.zeros(len(row_names))
+                continue
+
+            tokens = line.split()
+
+            if section == b"COLUMNS":
+                if len(tokens) >= 3 and tokens[1].strip(b"'\"").upper() == b"MARKER":
+                    in_integer_block = b"INTORG" in tokens[2].upper()
+                    continue
+                col = tokens[0]
+                if not col_names or col_names[-1] != col:
+                    if col_names:
+                        col_ptr.append(len(rows))
+                    col_names.append(col)
+                    integer.append(in_integer_block)
+                    objective.append(0.0)
+                for k in range(1, len(tokens) - 1, 2):
+                    row = tokens[k]
+                    value = float(tokens[k + 1])
+                    if row == objective_row:
+                        objective[-1] = value
+                    elif row in row_index:
+                        rows.append(row_index[row])
+                        values.append(value)
+                    elif row not in free_rows:
+                        raise ValueError("Unknown row " + row.decode() + " in " + path)
+
+            elif section == b"ROWS":
+                kind, row = tokens[0].upper(), tokens[1]
+                if kind == b"N":
+                    if objective_row is None:
+                        objective_row = row
+                    else:
+                        free_rows.add(row)
+                else:
+                    row_index[row] = len(row_names)
+                    row_names.append(row)
+                    row_sense.append(kind)
+
+            elif section == b"RHS":
+                for k in range(len(tokens) % 2, len(tokens) - 1, 2): # The name of the RHS vector is optional
+                    row = tokens[k]
+                    value = float(tokens[k + 1])
+                    if row == objective_row:
+                        objective_offset = -value
+                    elif row in row_index:
+                        rhs[row_index[row]] = value
+
+            elif section == b"RANGES":
+                for k in range(len(tokens) % 2, len(tokens) - 1, 2):
+                    if tokens[k] in row_index:
+                        ranges[row_index[tokens[k]]] = float(tokens[k + 1])
+
+            elif section == b"BOUNDS":
+                kind = tokens[0].upper()
+                if kind in (b"FR", b"MI", b"PL", b"BV", b"SC"): # Bounds whose value is optional, resolved below
+                    bounds.append((kind, None, tokens[1:]))
+                else: # The name of the bound set is optional
+                    bounds.append((kind, tokens[-2], tokens[-1]))
+
+            elif section == b"OBJSENSE":
+                sense = "max" if tokens[0].upper() in (b"MAX", b"MAXIMIZE") else "min"
+
+    if rhs is None:
+        rhs = np.zeros(len(row_names))
+    col_ptr.append(len(rows))
+    n = len(col_names)
+    m = len(row_names)
+
+    # Constraints
+    row_sense = np.array(row_sense, dtype = 'S1')
+    row_lower = np.where(row_sense == b"L", -np.inf, rhs)
+    row_upper = np.where(row_sense == b"G", np.inf, rhs)
+    for i, value in ranges.items():
+        if row_sense[i] == b"E":
+            if value >= 0:
+                row_upper[i] = rhs[i] + value
+            else:
+                row_lower[i] = rhs[i] + value
+        elif row_sense[i] == b"L":
+            row_lower[i] = rhs[i] - abs(value)
+        else:
+            row_upper[i] = rhs[i] + abs(value)
+
+    # Variables
+    col_index = {col: j for j, col in enumerate(col_names)}
+    integer = np.array(integer, dtype = bool)
+    semicontinuous = np.zeros(n, dtype = bool)
+    col_lower = np.zeros(n)
+    col_upper = np.full(n, np.inf)
+    for kind, col, value in bounds:
+        if col is None: # The column comes after the name of the bound set, if the line has one, and before the value
+            fields = value
+            named = len(fields) > 2 or (len(fields) == 2 and fields[1] in col_index)
+            col = fields[1] if named else fields[0]
+            value = fields[2] if named and len(fields) > 2 else (fields[1] if not named and len(fields) > 1 else None)
+        j = col_index[col]
+        if kind == b"UP" or kind == b"UI":
+            col_upper[j] = to_bound(value)
+            if col_upper[j] < 0 and col_lower[j] == 0: # Negative upper bound on a variable without lower bound
+                col_lower[j] = -np.inf
+        elif kind == b"LO" or kind == b"LI":
+            col_lower[j] = to_bound(value)
+        elif kind == b"FX":
+            col_lower[j] = col_upper[j] = to_bound(value)
+        elif kind == b"FR":
+            col_lower[j] = -np.inf
+            col_upper[j] = np.inf
+        elif kind == b"MI":
+            col_lower[j] = -np.inf
+        elif kind == b"PL":
+            col_upper[j] = np.inf
+        elif kind == b"BV":
+            col_lower[j] = 0
+            col_upper[j] = 1
+        elif kind == b"SC":
+            col_upper[j] = to_bound(value) if value is not None else np.inf
+            semicontinuous[j] = True
+        if kind in (b"BV", b"LI", b"UI"):
+            integer[j] = True
+    binary = integer & (col_lower == 0) & (col_upper == 1)
+
+    # CSC to CSR
+    col_ptr = np.frombuffer(col_ptr, dtype = np.int64)
+    rows = np.frombuffer(rows, dtype = np.int64)
+    cols = np.repeat(np.arange(n, dtype = np.int64), np.diff(col_ptr))
+    order = np.argsort(rows, kind = 'stable')
+    A_indptr = np.zeros(m + 1, dtype = np.int64)
+    np.cumsum(np.bincount(rows, minlength = m), out = A_indptr[1:])
+
+    return Model(name, sense, objective_offset,
+                 objective = np.frombuffer(objective, dtype = float).copy(),
+                 A_indptr = A_indptr,
+                 A_indices = cols[order],
+                 A_data = np.frombuffer(values, dtype = float)[order],
+                 row_sense = row_sense,
+                 rhs = rhs,
+                 row_lower = row_lower,
+                 row_upper = row_upper,
+                 col_lower = col_lower,
+                 col_upper = col_upper,
+                 integer = integer,
+                 binary = binary,
+                 semicontinuous = semicontinuous,
+                 row_names = np.array([row.decode() for row in row_names], dtype = str),
+                 col_names = np.array([col.decode() for col in col_names], dtype = str))
+
+
+def qplib_lines(f):
+    # Tokens of the lines of a QPLIB file, without comments and blank lines
+    for line in f:
+        tokens = line.split(b"#", 1)[0].split()
+        if tokens:
+            yield tokens
+
+
+def read_entries(lines, width):
+    # Sparse entries "i [j [k]] value" of a QPLIB file, preceded by their number; returns the 0-based
+    # indices as width arrays and the values
+    count = int(next(lines)[0])
+    indices = array('q')
+    values = array('d')
+    for tokens in itertools.islice(lines, count):
+        indices.extend(map(int, tokens[:width]))
+        values.append(float(tokens[width]))
+    indices = np.frombuffer(indices, dtype = np.int64).reshape(-1, width) - 1
+    return [indices[:, k].copy() for k in range(width)], np.frombuffer(values, dtype = float).copy()
+
+
+def read_vector(lines, size, infinity = None):
+    # Dense vector of a QPLIB file, given by its default value and its non-default entries "i value"
+    vector = np.full(size, float(next(lines)[0]))
+    count = int(next(lines)[0])
+    for tokens in itertools.islice(lines, count):
+        vector[int(tokens[0]) - 1] = float(tokens[1])
+    if infinity is not None:
+        vector[vector >= infinity] = np.inf
+        vector[vector <= -infinity] = -np.inf
+    return vector
+
+
+def names_start(tail, end):
+    # Start of the block of names ending at end in the last lines of a QPLIB file (their number followed by
+    # lines "i name"), or None if these lines are not names
+    for start in range(end - 1, -1, -1):
+        if len(tail[start]) == 1:
+            return start if tail[start][0].isdigit() and int(tail[start][0]) == end - start - 1 else None
+        if len(tail[start]) != 2:
+            return None
+    return None
+
+
+def read_names(tail, start, end, size, prefix):
+    names = [prefix + str(k + 1) for k in range(size)]
+    if start is not None:
+        for tokens in tail[start + 1:end]:
+            names[int(tokens[0]) - 1] = tokens[1].decode()
+    return np.array(names, dtype = str)
+
+
+def read_qplib(path):
+    # Parses a QPLIB file (see http://qplib.zib.de/doc.html) in a single pass over its lines. The sections
+    # present depend on the problem type: Q0 unless the objective is linear, the constraints unless there
+    # are none (N) or only bounds (B), their quadratic parts if they are quadratic (D, C, or Q), the bounds
+    # unless all variables are binary, and the variable types if they are mixed (M, I, or G). The starting
+    # points are skipped.
+    with open_instance(path) as f:
+        lines = qplib_lines(f)
+        name = next(lines)[0].decode()
+        problem_type = next(lines)[0].decode().upper()
+        assert len(problem_type) == 3 # Three-letter code of the problem type
+        objective_type, variables_type, constraints_type = problem_type
+        sense = "max" if next(lines)[0].lower().startswith(b"max") else "min"
+        n = int(next(lines)[0])
+        has_constraints = constraints_type not in "NB"
+        m = int(next(lines)[0]) if has_constraints else 0
+
+        no_entries = lambda width: ([np.zeros(0, dtype = np.int64)] * width, np.zeros(0))
+        (Q0_rows, Q0_cols), Q0_data = read_entries(lines, 2) if objective_type != "L" else no_entries(2)
+        objective = read_vector(lines, n)
+        objective_offset = float(next(lines)[0])
+        (Qc_cons, Qc_rows, Qc_cols), Qc_data = read_entries(lines, 3) if constraints_type in "DCQ" else no_entries(3)
+        (rows, cols), values = read_entries(lines, 2) if has_constraints else no_entries(2)
+        infinity = float(next(lines)[0])
+
+        if has_constraints:
+            row_lower = read_vector(lines, m, infinity)
+            row_upper = read_vector(lines, m, infinity)
+        else:
+            row_lower = row_upper = np.zeros(0)
+        if variables_type != "B":
+            col_lower = read_vector(lines, n, infinity)
+            col_upper = read_vector(lines, n, infinity)
+        else:
+            col_lower = np.zeros(n)
+            col_upper = np.ones(n)
+        if variables_type in "MIG":
+            types = read_vector(lines, n)
+        else:
+            types = np.full(n, 2.0 if variables_type == "B" else 0.0)
+
+        tail = list(lines) # Starting points and names, which are short
+    row_start = names_start(tail, len(tail))
+    col_start = names_start(tail, row_start) if row_start is not None else None
+    if col_start is None:
+        row_start = None
+
+    # Constraints
+    row_sense = np.full(m, b"R", dtype = 'S1')
+    row_sense[row_lower == row_upper] = b"E"
+    row_sense[np.isinf(row_lower) & ~np.isinf(row_upper)] = b"L"
+    row_sense[~np.isinf(row_lower) & np.isinf(row_upper)] = b"G"
+    row_sense[np.isinf(row_lower) & np.isinf(row_upper)] = b"N"
+    rhs = np.where(np.isin(row_sense, [b"E", b"G"]), row_lower, np.where(row_sense == b"N", 0.0, row_upper))
+
+    # Variables (types 0, 1, and 2 are continuous, integer, and binary)
+    integer = types != 0
+    binary = types == 2
+    col_lower[binary & (col_lower < 0)] = 0
+    col_upper[binary & (col_upper > 1)] = 1
+
+    order = np.lexsort((cols, rows))
+    A_indptr = np.zeros(m + 1, dtype = np.int64)
+    np.cumsum(np.bincount(rows, minlength = m), out = A_indptr[1:])
+
+    return QuadraticModel(name, sense, objective_offset,
+                          objective = objective,
+                          A_indptr = A_indptr,
+                          A_indices = cols[order],
+                          A_data = values[order],
+                          row_sense = row_sense,
+                          rhs = rhs,
+                          row_lower = row_lower,
+                          row_upper = row_upper,
+                          col_lower = col_lower,
+                          col_upper = col_upper,
+                          integer = integer,
+                          binary = binary,
+                          semicontinuous = np.zeros(n, dtype = bool),
+                          row_names = read_names(tail, row_start, len(tail), m, "c"),
+                          col_names = read_names(tail, col_start, row_start, n, "x"),
+                          Q0_rows = Q0_rows,
+                          Q0_cols = Q0_cols,
+                          Q0_data = Q0_data,
+                          Qc_cons = Qc_cons,
+                          Qc_rows = Qc_rows,
+                          Qc_cols = Qc_cols,
+                          Qc_data = Qc_data)
+
+
+MODEL_CLASSES = {"Model": Model, "QuadraticModel": QuadraticModel}
+
+
+def save_model(model, directory, source):
+    # Saves the arrays of a model as .npy files in directory, replacing it atomically
+    temp = os.path.join(os.path.dirname(directory), "." + os.path.basename(directory) + "." + uuid.uuid4().hex + ".part")
+    os.makedirs(temp)
+    try:
+        for key in model.ARRAYS:
+            np.save(os.path.join(temp, key + ".npy"), getattr(model, key), allow_pickle = False)
+        stat = os.stat(source)
+        with open(os.path.join(temp, "model.json"), 'w') as f:
+            json.dump({"version":MODEL_CACHE_VERSION, "class":type(model).__name__, "name":model.name, "sense":model.sense, "objective_offset":model.objective_offset, "source_size":stat.st_size, "source_mtime":stat.st_mtime_ns}, f)
+        if os.path.isdir(directory):
+            shu.rmtree(directory, ignore_errors = True)
+        os.replace(temp, directory)
+    except OSError: # Another process saved the same model in the meantime
+        pass
+    finally:
+        if os.path.isdir(temp):
+            shu.rmtree(temp, ignore_errors = True)
+
+
+def load_saved_model(directory, source):
+    # Model saved by save_model with its arrays memory-mapped, or None if missing or outdated
+    try:
+        with open(os.path.join(directory, "model.json")) as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    stat = os.stat(source)
+    if info.get("version") != MODEL_CACHE_VERSION or info["source_size"] != stat.st_size or info["source_mtime"] != stat.st_mtime_ns:
+        return None
+    model_class = MODEL_CLASSES[info["class"]]
+    arrays = {key: np.load(os.path.join(directory, key + ".npy"), mmap_mode = 'r', allow_pickle = False) for key in model_class.ARRAYS}
+    return model_class(info["name"], info["sense"], info["objective_offset"], **arrays)
+
+
+def model_reader(path):
+    # Parser for the format of an instance file, given by its extension
+    extension = path[:-len(".gz")] if path.endswith(".gz") else path
+    if extension.endswith(".qplib"):
+        return read_qplib
+    assert extension.endswith(".mps") # Only MPS and QPLIB files can be parsed
+    return read_mps
+
+
+# Structural features computed by model_features, which extend the catalog (see MIPLIBing.compute_features)
+FEATURES = ['row_degree_min', 'row_degree_max', 'row_degree_mean', 'col_degree_min', 'col_degree_max', 'col_degree_mean', 'coef_min', 'coef_max', 'equality_rows', 'binary_density']
+
+
+def model_features(model):
+    # Degrees of the rows and columns of the constraint matrix, range of the absolute values of its nonzero
+    # coefficients, number of equality rows, and density (%) of the block of the binary columns
+    row_degree = np.diff(model.A_indptr)
+    col_degree = np.bincount(model.A_indices, minlength = model.nb_var)
+    coefficients = np.abs(model.A_data)
+    coefficients = coefficients[coefficients != 0]
+    nb_bin = int(model.binary.sum())
+    features = {}
+    for key, values in [('row_degree', row_degree), ('col_degree', col_degree), ('coef', coefficients)]:
+        features[key + '_min'] = float(values.min()) if len(values) else np.nan
+        features[key + '_max'] = float(values.max()) if len(values) else np.nan
+    features['row_degree_mean'] = float(row_degree.mean()) if len(row_degree) else np.nan
+    features['col_degree_mean'] = float(col_degree.mean()) if len(col_degree) else np.nan
+    features['equality_rows'] = int((model.row_sense == b"E").sum())
+    features['binary_density'] = 100.0 * int(col_degree[model.binary].sum()) / (nb_bin * model.nb_const) if nb_bin and model.nb_const else np.nan
+    return {key: features[key] for key in FEATURES}
+
+
+def file_features(path):
+    # Features of an instance file, parsed in a single pass unless its model is already saved next to it,
+    # or None if the file format is not supported or the file cannot be parsed, whatever the error is,
+    # so that one malformed file does not stop the computation for the others
+    try:
+        reader = model_reader(path)
+        model = load_saved_model(path + ".model", path)
+        if model is None:
+            model = reader(path)
+        return model_features(model)
+    except Exception:
+        return None
+
+
+def load_model(path, cache = True):
+    # Parses the instance file at path, unless it was already parsed and saved next to it
+    reader = model_reader(path)
+    directory = path + ".model"
+    if cache:
+        model = load_saved_model(directory, path)
+        if model is not None:
+            return model
+    model = reader(path)
+    if cache:
+        save_model(model, directory, path)
+    return model
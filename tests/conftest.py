@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "src"), os.path.join(ROOT, "benchmarks")]
+
+from fixtures import FixtureServer
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # Local stand-in for the sites of the libraries (see benchmarks/fixtures.py), used as the HTTP proxy
+    server = FixtureServer()
+    monkeypatch.setenv("http_proxy", server.url)
+    monkeypatch.delenv("no_proxy", raising = False)
+    monkeypatch.delenv("NO_PROXY", raising = False)
+    yield server
+    server.close()
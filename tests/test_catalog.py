@@ -0,0 +1,122 @@
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import fixtures
+from MIPLIBing import MIPLIBing, Libraries, Status
+from MIPLIBing.MIPLIBing import CatalogIndex, read_first_table
+
+PAGES = [(host, path) for host, path in fixtures.SAVED if path.endswith(".html")]
+
+
+@pytest.mark.parametrize("host, path", PAGES)
+def test_read_first_table_matches_read_html_on_saved_pages(host, path):
+    page = fixtures.saved_page(host, path)
+    df = read_first_table(page)
+    assert df is not None # The pages should not need the full HTML parser
+    pd.testing.assert_frame_equal(df, pd.read_html(io.BytesIO(page))[0])
+
+
+@pytest.mark.parametrize("rows", [1, 50])
+def test_read_first_table_matches_read_html_on_synthetic_pages(rows):
+    for page in [fixtures.miplib_page(rows), fixtures.minlplib_page(rows), fixtures.qplib_page(rows)]:
+        pd.testing.assert_frame_equal(read_first_table(page), pd.read_html(io.BytesIO(page))[0])
+
+
+def test_read_first_table_reads_thousands_and_line_breaks():
+    page = fixtures.table(["Instance", "Nonz.", "Tags"], [["a", "1,234", "x<br>y"], ["b", "12,345,678", "z<BR/>w <br >v"]])
+    df = read_first_table(page)
+    pd.testing.assert_frame_equal(df, pd.read_html(io.BytesIO(page))[0])
+    assert df["Nonz."].tolist() == [1234, 12345678]
+    assert df["Tags"].tolist() == ["x y", "z w v"]
+
+
+def synthetic_catalog():
+    # Catalog of 40 synthetic MIPLIB instances, with missing values in a numeric column and in the tags
+    df = read_first_table(fixtures.miplib_page(40))
+    df.loc[[3, 17, 30], 'Variables'] = np.nan
+    df.loc[[5, 17, 22], 'Tags'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("low, high", [(None, None), (None, 20), (25, None), (15, 15), (12.5, 30), (100, 5), (0, 1000)])
+def test_catalog_index_range_matches_column_scan(low, high):
+    df = synthetic_catalog()
+    expected = df['Variables'].notna()
+    if low is not None:
+        expected &= df['Variables'] >= low
+    if high is not None:
+        expected &= df['Variables'] <= high
+    assert (CatalogIndex(df).range('Variables', low, high) == expected.to_numpy()).all()
+
+
+@pytest.mark.parametrize("term", ["binary", "bin", "benchmark|feasibility", "cover|decomp", "no_solution", "missing",
+                                  "b.nary", "^bench", "ing$", "~binary", "~cover|decomp", "~^bench"])
+def test_catalog_index_tag_matches_column_scan(term):
+    # Terms of tag characters and "|" use the bitsets of the tags, the others the fallback to str.contains,
+    # and "~" negates a term as in the tags filter of get_instances
+    df = synthetic_catalog()
+    index = CatalogIndex(df)
+    negated = term[0] == '~'
+    term = term.lstrip('~')
+    mask, expected = index.tag(term), df['Tags'].str.contains(term, na = False).to_numpy(dtype = bool)
+    if negated:
+        mask, expected = ~mask, ~expected
+    assert (mask == expected).all()
+
+SAVED_INSTANCES = {Libraries.MIPLIB2017_Benchmark: 6, Libraries.MIPLIB2017_Collection: 7, Libraries.MINLPLIB: 7, Libraries.QPLIB: 5}
+
+
+@pytest.mark.parametrize("library", list(Libraries))
+def test_catalog_from_saved_pages(server, tmp_path, library):
+    mip = MIPLIBing(library = library, local_directory = str(tmp_path))
+    instances, downloads = mip._select_instances()
+    assert len(instances) == len(downloads) == SAVED_INSTANCES[library]
+    if library == Libraries.QPLIB: # Values of qplib.solu are merged by instance name
+        assert {instance.name: instance.primal for instance in instances}["0031"] == -1.9217191130
+
+
+PAGE = ("miplib.zib.de", "/tag_collection.html")
+
+
+def test_unchanged_catalog_costs_a_304(server, tmp_path):
+    server.rows = 10
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path))
+    mtime = os.stat(mip.instances_cvs_path).st_mtime_ns
+    assert mip.update_catalog() == {"added":[], "removed":[], "changed":[]}
+    assert server.paths[PAGE] == 2 and server.statuses[304] == 1
+    server.validators = False # The page is sent again, but its catalog is the same
+    assert mip.update_catalog() == {"added":[], "removed":[], "changed":[]}
+    assert server.statuses[304] == 1
+    assert os.stat(mip.instances_cvs_path).st_mtime_ns == mtime
+
+
+def test_changed_catalog_reports_its_changes(server, tmp_path):
+    server.rows = 10
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path))
+    # inst10 is added, inst0 is renamed, and the status of inst1 changes
+    page = fixtures.miplib_page(11).replace(b"<td>inst0</td>", b"<td>renamed</td>").replace(b"<td>inst1</td><td>hard</td>", b"<td>inst1</td><td>easy</td>")
+    server.rows = 11
+    server.files[PAGE + (11, server.size)] = page
+    server.modified[PAGE + (11, server.size)] = time.time() + 1
+    changes = mip.update_catalog()
+    assert {key: sorted(names) for key, names in changes.items()} == {"added":["inst10", "renamed"], "removed":["inst0"], "changed":["inst1"]}
+    assert mip.metrics.phases["catalog_update"] > 0
+    instance, = mip.get_instances(instance_name = "inst1", with_status = Status.easy)
+    assert instance.status == "easy"
+
+
+def test_refresh_ttl(server, tmp_path):
+    server.rows = 10
+    MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path))
+    MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path), refresh_ttl = 3600)
+    assert server.paths[PAGE] == 1 # Checked less than an hour ago
+    time.sleep(0.01)
+    MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path), refresh_ttl = 0)
+    assert server.paths[PAGE] == 2 and server.statuses[304] == 1
+    MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path))
+    assert server.paths[PAGE] == 2 # Never refreshed without refresh_ttl
@@ -0,0 +1,88 @@
+import gzip as gz
+import os
+import time
+
+from MIPLIBing import MIPLIBing, Libraries
+
+
+def download(directory, count, max_workers):
+    # Seconds taken by get_instances to download the files of count instances, which are checked
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(directory), max_workers = max_workers)
+    start = time.perf_counter()
+    instances = mip.get_instances(max_var = 10 + count - 1)
+    seconds = time.perf_counter() - start
+    assert [instance.name for instance in instances] == ["inst" + str(i) for i in range(count)] # Order of the catalog
+    assert all(instance.path is not None for instance in instances)
+    return seconds
+
+
+def test_downloads_speed_up_with_workers(server, tmp_path):
+    server.rows = 40
+    server.latency = 0.05
+    seconds = {max_workers: download(tmp_path / str(max_workers), 24, max_workers) for max_workers in [1, 4, 8]}
+    assert seconds[1] > 24 * 0.05
+    assert seconds[4] < seconds[1] / 2
+    assert seconds[8] < seconds[4]
+
+
+def test_stalled_transfer_is_resumed(server, tmp_path):
+    server.rows = 10
+    server.size = 10000
+    body = server.content("miplib.zib.de", "/WebData/instances/inst3.mps.gz")
+    server.cuts = 1
+    server.cut_after = len(body) // 2
+    server.stall = 10 # The connection stays open without sending anything
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path), timeout = (5, 0.5))
+    start = time.perf_counter()
+    instance, = mip.get_instances(instance_name = "inst3")
+    assert time.perf_counter() - start < server.stall
+    assert server.statuses[206] == 1 # Resumed from the last byte received
+    with open(instance.path, "rb") as f:
+        assert f.read() == gz.decompress(body)
+
+
+def test_resume_restarts_if_the_file_changed(server, tmp_path):
+    server.rows = 10
+    server.size = 10000
+    path = "/WebData/instances/inst4.mps.gz"
+    old = server.content("miplib.zib.de", path)
+    new = gz.compress(b"changed " + gz.decompress(old))
+    server.cuts = 1
+    server.cut_after = len(old) // 2
+    server.stall = 10 # The partial body is received before the read times out
+
+    def change(event, fields):
+        # The file is replaced on the server between the dropped connection and the resumed request
+        if event == "download_retry":
+            key = ("miplib.zib.de", path, server.rows, server.size)
+            server.files[key] = new
+            server.modified[key] = time.time() + 1
+
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path), timeout = (5, 0.5), callbacks = [change])
+    instance, = mip.get_instances(instance_name = "inst4")
+    assert mip.metrics.retries == 1
+    assert server.statuses[206] == 0 # The If-Range validator no longer matched
+    with open(instance.path, "rb") as f:
+        assert f.read() == gz.decompress(new)
+
+
+def instance_fetches(server):
+    return sum(count for (host, path), count in server.paths.items() if path.startswith("/WebData/instances/"))
+
+
+def test_iter_instances_yields_in_order_and_stops_prefetching(server, tmp_path):
+    server.rows = 20
+    server.latency = 0.05
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path / "all"))
+    instances = list(mip.iter_instances(prefetch = 4, max_var = 21))
+    assert [instance.name for instance in instances] == ["inst" + str(i) for i in range(12)] # Order of the catalog
+    assert all(os.path.isfile(instance.path) for instance in instances)
+
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path / "some"))
+    fetches = instance_fetches(server)
+    generator = mip.iter_instances(prefetch = 3)
+    assert [next(generator).name for i in range(2)] == ["inst0", "inst1"]
+    time.sleep(0.02) # The workers of the first two files take the next ones
+    generator.close()
+    time.sleep(5 * server.latency)
+    assert instance_fetches(server) - fetches == 2 + 3 # The consumed instances and the prefetched ones
@@ -0,0 +1,95 @@
+import gzip as gz
+import logging
+import os
+import subprocess
+import sys
+
+from MIPLIBing import MIPLIBing, Libraries
+
+FILE_EVENTS = ["cache_hit", "download_start", "download_done", "download_retry", "download_failed"]
+
+
+class Records(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self, logging.DEBUG)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_events_reach_callbacks_logger_and_summary(server, tmp_path):
+    server.rows = 10
+    events = []
+    records = Records()
+    logger = logging.getLogger("MIPLIBing")
+    level = logger.level
+    logger.addHandler(records)
+    logger.setLevel(logging.DEBUG)
+    try:
+        mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path), retries = 1, callbacks = [lambda event, fields: events.append((event, fields))])
+        bodies = {name: server.content("miplib.zib.de", "/WebData/instances/" + name + ".mps.gz") for name in ["inst1", "inst2", "inst3"]}
+        mip.get_instances(instance_name = "inst1") # Download
+        mip.get_instances(instance_name = "inst1") # Hit
+        server.cuts = 1
+        server.cut_after = len(bodies["inst2"]) // 2
+        mip.get_instances(instance_name = "inst2") # Retry
+        server.cuts = 1
+        server.cut_after = len(bodies["inst3"]) // 2
+        mip.retries = 0
+        instance, = mip.get_instances(instance_name = "inst3") # Failure
+        assert instance.path is None
+    finally:
+        logger.removeHandler(records)
+        logger.setLevel(level)
+
+    events = [(event, fields) for event, fields in events if event in FILE_EVENTS]
+    assert [(event, fields.get("instance")) for event, fields in events] == [
+        ("download_start", "inst1"), ("download_done", "inst1"),
+        ("cache_hit", "inst1"),
+        ("download_start", "inst2"), ("download_retry", None), ("download_done", "inst2"),
+        ("download_start", "inst3"), ("download_failed", "inst3")]
+    assert all(fields["library"] == "MIPLIB2017_Collection" for event, fields in events)
+    url = {fields["instance"]: fields["url"] for event, fields in events if event == "download_start"}
+    assert all(url[name].endswith("/WebData/instances/" + name + ".mps.gz") for name in bodies)
+    done = {fields["instance"]: fields for event, fields in events if event == "download_done"}
+    for name in ["inst1", "inst2"]:
+        assert done[name]["url"] == url[name]
+        assert done[name]["bytes_received"] == len(bodies[name])
+        assert done[name]["bytes_written"] == len(gz.decompress(bodies[name]))
+        assert done[name]["inflated"] is True
+        assert done[name]["seconds"] > 0
+    retry = events[4][1]
+    assert retry["url"] == url["inst2"] and retry["attempt"] == 1 and retry["bytes_received"] <= len(bodies["inst2"]) // 2
+    failed = events[-1][1]
+    assert failed["url"] == url["inst3"] and failed["error"]
+
+    # The logger gets the same events, with the fields on the records
+    records = [record for record in records.records if getattr(record, "event", None) in FILE_EVENTS]
+    assert [(record.event, record.fields) for record in records] == events
+    assert [record.levelname for record in records] == ["INFO", "DEBUG", "INFO", "INFO", "WARNING", "DEBUG", "INFO", "WARNING"]
+
+    summary = mip.metrics
+    assert summary.cache_hits == 1
+    assert summary.cache_misses == 3
+    assert summary.files_downloaded == 2
+    assert summary.retries == 1
+    assert summary.bytes_received == len(bodies["inst1"]) + len(bodies["inst2"])
+    assert summary.bytes_written == summary.bytes_inflated == len(gz.decompress(bodies["inst1"])) + len(gz.decompress(bodies["inst2"]))
+    assert summary.failures == [("inst3", url["inst3"], failed["error"])]
+    assert set(summary.latencies) == {"inst1", "inst2", "inst3"}
+    assert summary.phases["download"] > 0
+
+
+def test_warnings_are_not_printed_without_verbose(server, tmp_path):
+    # Without a handler configured by the application, a failed download prints nothing (also not through
+    # the last resort handler of logging)
+    server.rows = 10
+    script = ("from MIPLIBing import MIPLIBing, Libraries\n"
+              "mip = MIPLIBing(library = Libraries.MINLPLIB, file_extension = 'osil', local_directory = " + repr(str(tmp_path)) + ")\n"
+              "assert mip.get_instances(instance_name = 'm1')[0].path is None\n")
+    env = dict(os.environ, PYTHONPATH = os.pathsep.join(sys.path))
+    result = subprocess.run([sys.executable, "-c", script], env = env, capture_output = True, text = True, timeout = 60)
+    assert result.returncode == 0, result.stderr
+    assert server.statuses[404] == 1 # The file does not exist
+    assert result.stdout == "" and result.stderr == ""
@@ -0,0 +1,16 @@
+from MIPLIBing import MIPLIBingFederation, Libraries
+
+
+def test_federation_names_duplicates_and_summary(server, tmp_path):
+    federation = MIPLIBingFederation(libraries = [Libraries.MIPLIB2017_Benchmark, Libraries.MIPLIB2017_Collection, Libraries.QPLIB], local_directory = str(tmp_path), max_workers = 4)
+
+    instance, = federation.get_instances(instance_name = "0018")
+    assert instance.name == "0018" and instance.library == Libraries.QPLIB and instance.path is not None
+
+    # 30n20b8 and bnatt400 are in both MIPLIB libraries, and are returned once, from the first one
+    instances, summary = federation.get_instances(libraries = [Libraries.MIPLIB2017_Benchmark, Libraries.MIPLIB2017_Collection], return_summary = True)
+    names = [instance.name for instance in instances]
+    assert len(names) == len(set(names)) == 11
+    assert {instance.library for instance in instances if instance.name in ["30n20b8", "bnatt400"]} == {Libraries.MIPLIB2017_Benchmark}
+    assert all(instance.path is not None for instance in instances)
+    assert summary.files_downloaded == 11 and "download" in summary.phases and "query" in summary.phases
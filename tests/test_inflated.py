@@ -0,0 +1,43 @@
+import gzip as gz
+import os
+import time
+
+from MIPLIBing import MIPLIBing, Libraries
+
+
+def test_inflated_copies_are_evicted_and_refreshed(server, tmp_path):
+    server.rows = 10
+    server.size = 1000
+    bodies = [gz.decompress(server.content("miplib.zib.de", "/WebData/instances/inst" + str(i) + ".mps.gz")) for i in range(3)]
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path), compressed_cache = True, inflated_cache_size = int(2.5 * len(bodies[0])))
+    mip.inflated_cache.min_age = 0
+    instances = mip.get_instances(max_var = 12)
+    assert all(instance.path.endswith(".mps.gz") for instance in instances)
+    for instance, body in zip(instances, bodies):
+        with instance.open() as f:
+            assert f.read() == body
+
+    paths = []
+    for instance, body in zip(instances, bodies):
+        paths.append(instance.materialize())
+        with open(paths[-1], "rb") as f:
+            assert f.read() == body
+        time.sleep(0.05) # Distinct times of use
+    assert [os.path.isfile(path) for path in paths] == [False, True, True] # The least recently used is removed
+
+    inode = os.stat(paths[1]).st_ino
+    assert instances[1].materialize() == paths[1]
+    assert os.stat(paths[1]).st_ino == inode # Used again without being inflated again
+
+    # A compressed file that changed is inflated again
+    changed = b"changed " + bodies[2]
+    with gz.open(instances[2].path, "wb") as f:
+        f.write(changed)
+    with open(instances[2].materialize(), "rb") as f:
+        assert f.read() == changed
+
+    # Copies used recently may be about to be opened by another process, and are kept
+    mip.inflated_cache.min_age = 60
+    time.sleep(0.05)
+    assert instances[0].materialize() == paths[0]
+    assert all(os.path.isfile(path) for path in paths)
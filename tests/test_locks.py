@@ -0,0 +1,49 @@
+import multiprocessing
+import os
+
+import pytest
+
+from MIPLIBing import MIPLIBing, Libraries
+from MIPLIBing.MIPLIBing import FileLock, THREAD_LOCKS
+
+
+def get_instances(directory, proxy, barrier, count):
+    # Worker process getting the first count instances of a cache shared with the other workers
+    os.environ["http_proxy"] = proxy
+    barrier.wait()
+    instances = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = directory, max_workers = 4).get_instances(max_var = 10 + count - 1)
+    assert len(instances) == count and all(instance.path is not None for instance in instances)
+
+
+def test_processes_fetch_each_url_once(server, tmp_path):
+    server.rows = 30
+    server.latency = 0.02
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(8)
+    processes = [context.Process(target = get_instances, args = (str(tmp_path), server.url, barrier, 20)) for _ in range(8)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(120)
+    assert [process.exitcode for process in processes] == [0] * 8
+    assert server.paths[("miplib.zib.de", "/tag_collection.html")] == 1 # The catalog is also built once
+    fetched = {path: count for (host, path), count in server.paths.items() if path.startswith("/WebData/instances/")}
+    assert fetched == {"/WebData/instances/inst" + str(i) + ".mps.gz": 1 for i in range(20)}
+
+
+def test_release_keeps_the_lock_of_the_next_holder(tmp_path):
+    path = str(tmp_path / ".lock")
+    lock = FileLock(path)
+    lock.acquire()
+    os.remove(path) # The lock is broken as stale and taken by another process
+    with open(path, "w") as f:
+        f.write("host 1 token\n")
+    with pytest.warns(UserWarning):
+        lock.release()
+    assert os.path.isfile(path)
+    assert path not in THREAD_LOCKS
+
+    os.remove(path)
+    with FileLock(path):
+        assert os.path.isfile(path)
+    assert not os.path.isfile(path) and path not in THREAD_LOCKS
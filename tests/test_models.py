@@ -0,0 +1,213 @@
+import os
+import warnings
+
+import numpy as np
+import pytest
+
+from MIPLIBing import MIPLIBing, Libraries, models
+
+MPS = """NAME bounds
+ROWS
+ N obj
+ L c1
+COLUMNS
+    a obj 1 c1 1
+    b obj 1 c1 1
+    c obj 1 c1 1
+    d obj 1 c1 1
+    e obj 1 c1 1
+    f obj 1 c1 1
+    g obj 1 c1 1
+RHS
+    rhs c1 10
+BOUNDS
+ BV bnd a 1
+ BV b
+ FR bnd c
+ MI d
+ UP e 4
+ SC bnd f 5
+ SC bnd g
+ENDATA
+"""
+
+
+QPLIB = """QPLIB_TEST # Mixed-integer QCQP with names
+QGQ
+maximize
+3 # variables
+2 # constraints
+2 # Q0
+1 1 2.0
+3 2 -1.0
+0.0 # b0
+1
+2 3.5
+1.5 # Objective constant
+2 # Qc
+1 1 1 1.0
+2 3 3 4.0
+3 # A
+1 1 1.0
+2 2 -2.0
+2 3 1.0
+1.0E+30 # Infinity
+-1.0E+30 # Constraint lower bounds
+1
+2 0.0
+5.0 # Constraint upper bounds
+1
+2 1.0E+30
+0.0 # Variable lower bounds
+1
+1 -2.0
+10.0 # Variable upper bounds
+1
+3 1.0E+30
+0 # Variable types
+2
+2 1
+3 2
+0.0 # Starting points
+1
+2 4.0
+0.0
+0
+0.0
+0
+3 # Variable names
+1 flow
+2 count
+3 pick
+2 # Constraint names
+1 cap
+2 demand
+"""
+
+QPLIB_BINARY = """QPLIB_BOX
+QBN
+minimize
+3
+2 # Q0
+2 2 1.0
+3 1 -0.5
+1.0 # b0
+1
+1 -1.0
+0.0
+1.0E+30
+0.0 # Starting point, without names after it
+1
+2 1.0
+0.0
+0
+"""
+
+
+def test_read_mps_bounds_with_optional_names_and_values(tmp_path):
+    path = tmp_path / "bounds.mps"
+    path.write_text(MPS)
+    model = models.read_mps(str(path))
+    assert model.col_lower.tolist() == [0, 0, -np.inf, -np.inf, 0, 0, 0]
+    assert model.col_upper.tolist() == [1, 1, np.inf, np.inf, 4, 5, np.inf]
+    assert model.binary.tolist() == [True, True, False, False, False, False, False]
+    assert model.semicontinuous.tolist() == [False] * 5 + [True, True]
+
+
+def test_read_qplib_with_quadratic_constraints_bounds_and_names(tmp_path):
+    path = tmp_path / "QPLIB_TEST.qplib"
+    path.write_text(QPLIB)
+    model = models.read_qplib(str(path))
+    assert (model.name, model.sense, model.objective_offset) == ("QPLIB_TEST", "max", 1.5)
+    assert model.objective.tolist() == [0, 3.5, 0]
+    assert (model.Q0_rows.tolist(), model.Q0_cols.tolist(), model.Q0_data.tolist()) == ([0, 2], [0, 1], [2.0, -1.0])
+    assert (model.Qc_cons.tolist(), model.Qc_rows.tolist(), model.Qc_cols.tolist(), model.Qc_data.tolist()) == ([0, 1], [0, 2], [0, 2], [1.0, 4.0])
+    assert (model.A_indptr.tolist(), model.A_indices.tolist(), model.A_data.tolist()) == ([0, 1, 3], [0, 1, 2], [1.0, -2.0, 1.0])
+    assert model.row_lower.tolist() == [-np.inf, 0] and model.row_upper.tolist() == [5, np.inf]
+    assert model.row_sense.tolist() == [b"L", b"G"] and model.rhs.tolist() == [5, 0]
+    assert model.col_lower.tolist() == [-2, 0, 0] and model.col_upper.tolist() == [10, 10, 1]
+    assert model.integer.tolist() == [False, True, True] and model.binary.tolist() == [False, False, True]
+    assert model.col_names.tolist() == ["flow", "count", "pick"] and model.row_names.tolist() == ["cap", "demand"]
+    assert (model.nb_var, model.nb_const, model.nb_nz, model.quadratic_cons) == (3, 2, 3, 2)
+    assert model.obj_density == pytest.approx(100 * 3 / 9)
+
+
+def test_read_qplib_binary_without_names(tmp_path):
+    path = tmp_path / "QPLIB_BOX.qplib"
+    path.write_text(QPLIB_BINARY)
+    model = models.read_qplib(str(path))
+    assert (model.name, model.sense, model.nb_var, model.nb_const, model.nb_nz) == ("QPLIB_BOX", "min", 3, 0, 0)
+    assert model.objective.tolist() == [-1, 1, 1]
+    assert model.col_lower.tolist() == [0, 0, 0] and model.col_upper.tolist() == [1, 1, 1]
+    assert model.binary.all() and model.integer.all()
+    assert model.col_names.tolist() == ["x1", "x2", "x3"] and model.row_names.tolist() == []
+
+
+def test_load_model_memory_maps_the_parsed_arrays(server, tmp_path):
+    server.rows = 10
+    server.size = 12
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path))
+    instance, = mip.get_instances(instance_name = "inst2")
+    with warnings.catch_warnings(record = True): # The synthetic files do not have the sizes of the catalog
+        model = instance.load_model()
+    assert not isinstance(model.A_data, np.memmap) # Parsed
+    instance.nb_var, instance.nb_const, instance.nb_nz = model.nb_var, model.nb_const, model.nb_nz
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        cached = instance.load_model()
+    assert os.path.isfile(os.path.join(instance.path + ".model", "model.json"))
+    assert all(isinstance(getattr(cached, key), np.memmap) for key in ["A_indptr", "A_indices", "A_data", "col_lower", "col_upper"])
+    assert (cached.nb_var, cached.nb_const, cached.nb_nz) == (model.nb_var, model.nb_const, model.nb_nz)
+    assert (cached.A_data == model.A_data).all() and (cached.col_upper == model.col_upper).all()
+    assert not isinstance(instance.load_model(cache = False).A_data, np.memmap)
+
+    for attribute in ["nb_var", "nb_const", "nb_nz"]:
+        setattr(instance, attribute, getattr(instance, attribute) + 1)
+        with pytest.warns(UserWarning, match = attribute) as record:
+            instance.load_model()
+        assert len(record) == 1
+        setattr(instance, attribute, getattr(instance, attribute) - 1)
+
+
+def test_load_model_warns_on_quadratic_mismatch(server, tmp_path):
+    server.rows = 5
+    server.size = 12
+    mip = MIPLIBing(library = Libraries.QPLIB, local_directory = str(tmp_path))
+    instance, = mip.get_instances(instance_name = "0002")
+    with warnings.catch_warnings(record = True):
+        model = instance.load_model()
+    instance.nb_var, instance.nb_const, instance.quadratic_cons = model.nb_var, model.nb_const, model.quadratic_cons
+    instance.obj_density = round(model.obj_density, 2) # As rounded in the catalog
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        instance.load_model()
+    instance.obj_density += 1
+    with pytest.warns(UserWarning, match = "obj_density"):
+        instance.load_model()
+    instance.obj_density -= 1
+    instance.quadratic_cons += 1
+    with pytest.warns(UserWarning, match = "quadratic_cons"):
+        instance.load_model()
+
+
+def test_compute_features_skips_malformed_files(server, tmp_path):
+    server.rows = 10
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path))
+    good, bad = mip.get_instances(max_var = 11)
+    with open(bad.path, "w") as f:
+        f.write(MPS.replace(" BV b\n", " BV x\n")) # Bound on an unknown column
+    features = mip.compute_features(max_workers = 2).set_index("Instance")
+    assert features.loc[good.name, "row_degree_max"] == 3
+    assert features.loc[bad.name, models.FEATURES].isna().all()
+
+
+@pytest.mark.parametrize("key", ["max_vars", "max_Variables", "maxvar", "max_row_degree", "above_coef_min"])
+def test_unknown_filters_are_rejected(server, tmp_path, key):
+    server.rows = 10
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path))
+    with pytest.raises(TypeError, match = key):
+        mip.get_instances(**{key: 12})
+    with pytest.raises(TypeError, match = key):
+        mip.get_instances(instance_name = "inst1", **{key: 12})
+    with pytest.raises(TypeError, match = key):
+        next(mip.iter_instances(**{key: 12}))
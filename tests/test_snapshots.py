@@ -0,0 +1,26 @@
+import pytest
+
+from MIPLIBing import MIPLIBing, Libraries, import_snapshot
+
+
+def test_import_snapshot_without_network(server, tmp_path, monkeypatch):
+    path = str(tmp_path / "snapshot.zip")
+    online = str(tmp_path / "online")
+    instances = {}
+    for library in [Libraries.MIPLIB2017_Benchmark, Libraries.QPLIB]:
+        mip = MIPLIBing(library = library, local_directory = online)
+        instances[library] = sorted(instance.name for instance in mip.get_instances())
+        mip.export_snapshot(path, append = library != Libraries.MIPLIB2017_Benchmark)
+
+    monkeypatch.setenv("http_proxy", "http://127.0.0.1:9") # Nothing answers there
+    offline = str(tmp_path / "offline")
+    counts = import_snapshot(path, local_directory = offline)
+    assert counts == {library: len(names) for library, names in instances.items()}
+    for library, names in instances.items():
+        mip = MIPLIBing(library = library, local_directory = offline)
+        found = mip.get_instances()
+        assert sorted(instance.name for instance in found) == names
+        assert all(instance.path is not None for instance in found)
+
+    with pytest.raises(ValueError):
+        import_snapshot(path, local_directory = offline, libraries = [Libraries.MINLPLIB])
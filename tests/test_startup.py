@@ -0,0 +1,66 @@
+import csv
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from MIPLIBing import MIPLIBing, Libraries
+from MIPLIBing.MIPLIBing import catalog_from_arrays
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+HEAVY_MODULES = ["pandas", "numpy", "requests"]
+
+
+def heavy_modules(code):
+    # Heavy modules imported by code in a fresh interpreter
+    code += "\nimport sys; print(*[name for name in " + repr(HEAVY_MODULES) + " if name in sys.modules])"
+    env = dict(os.environ, PYTHONPATH = SOURCE + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    return subprocess.run([sys.executable, "-c", code], env = env, check = True, capture_output = True, text = True).stdout.split()
+
+
+def test_import_does_not_load_heavy_modules():
+    assert heavy_modules("import MIPLIBing") == []
+
+
+def test_lookup_by_name_on_warm_cache_does_not_load_heavy_modules(server, tmp_path):
+    server.rows = 20
+    MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path)).get_instances(instance_name = "inst7")
+    code = ("from MIPLIBing import MIPLIBing, Libraries\n" +
+            "instance, = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = " + repr(str(tmp_path)) + ").get_instances(instance_name = 'inst7')\n" +
+            "assert instance.path is not None")
+    assert heavy_modules(code) == []
+
+
+def test_saved_rows_are_not_rewritten_on_warm_loads(server, tmp_path):
+    server.rows = 20
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path))
+    mip._load_catalog()
+    written = os.stat(mip.instances_rows_path).st_mtime_ns
+    MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path))._load_catalog()
+    assert os.stat(mip.instances_rows_path).st_mtime_ns == written
+
+    os.remove(mip.instances_rows_path) # Missing rows are written again
+    MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path))._load_catalog()
+    assert os.path.isfile(mip.instances_rows_path)
+
+
+@pytest.mark.parametrize("library", list(Libraries))
+def test_binary_catalog_matches_csv_and_follows_it(server, tmp_path, library):
+    mip = MIPLIBing(library = library, local_directory = str(tmp_path))
+    mip._load_catalog()
+    with np.load(mip.instances_npz_path, allow_pickle = False) as data:
+        assert int(data["csv_mtime"]) == os.stat(mip.instances_cvs_path).st_mtime_ns
+        pd.testing.assert_frame_equal(catalog_from_arrays(data), pd.read_csv(mip.instances_cvs_path, dtype = {'Instance': str}))
+
+    # A changed CSV file is parsed again, and its binary copy rebuilt
+    df = pd.read_csv(mip.instances_cvs_path, dtype = {'Instance': str})
+    df.loc[0, 'Variables'] = 999
+    df.drop(columns = ['Unnamed: 0']).to_csv(mip.instances_cvs_path, quoting = csv.QUOTE_NONNUMERIC)
+    mip = MIPLIBing(library = library, local_directory = str(tmp_path))
+    assert mip._load_catalog()['Variables'].iloc[0] == 999
+    with np.load(mip.instances_npz_path, allow_pickle = False) as data:
+        assert int(data["csv_mtime"]) == os.stat(mip.instances_cvs_path).st_mtime_ns
+        assert catalog_from_arrays(data)['Variables'].iloc[0] == 999
@@ -0,0 +1,51 @@
+import collections
+import importlib
+import os
+
+from MIPLIBing import MIPLIBing, Libraries
+
+MIPLIBing_module = importlib.import_module("MIPLIBing.MIPLIBing") # Shadowed by the class in the package
+
+
+def test_verify_cache_refetches_a_shared_file_once(server, tmp_path):
+    # 30n20b8 is in both MIPLIB libraries, whose files are links to the same stored file
+    benchmark = MIPLIBing(library = Libraries.MIPLIB2017_Benchmark, local_directory = str(tmp_path))
+    collection = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path))
+    path = "/WebData/instances/30n20b8.mps.gz"
+    first, = benchmark.get_instances(instance_name = "30n20b8")
+    second, = collection.get_instances(instance_name = "30n20b8")
+    assert server.paths[("miplib.zib.de", path)] == 1 and collection.metrics.store_links == 1
+    with open(first.path, "rb") as f:
+        content = f.read()
+
+    with open(second.path, "r+b") as f: # Corrupts the stored file and both links to it
+        f.write(b"corrupt")
+    assert collection.verify_cache() == ["30n20b8"]
+    assert server.paths[("miplib.zib.de", path)] == 2
+    assert benchmark.verify_cache() == ["30n20b8"]
+    assert server.paths[("miplib.zib.de", path)] == 2 # Linked from the store, which was fetched again
+    assert benchmark.metrics.store_links == 1
+
+    os.remove(first.path) # Deleted without corrupting the stored file
+    assert benchmark.verify_cache() == ["30n20b8"]
+    assert server.paths[("miplib.zib.de", path)] == 2
+    for instance in [first, second]:
+        with open(instance.path, "rb") as f:
+            assert f.read() == content
+    assert benchmark.verify_cache() == collection.verify_cache() == []
+
+
+def test_downloads_write_the_manifest_and_the_index_once(server, tmp_path, monkeypatch):
+    server.rows = 20
+    writes = collections.Counter()
+    write_json = MIPLIBing_module.write_json
+    def counting_write_json(path, data):
+        writes[path] += 1
+        write_json(path, data)
+    monkeypatch.setattr(MIPLIBing_module, "write_json", counting_write_json)
+
+    mip = MIPLIBing(library = Libraries.MIPLIB2017_Collection, local_directory = str(tmp_path), max_workers = 4)
+    instances = mip.get_instances()
+    assert len(mip._read_manifest()) == len(instances) == 20
+    assert len(mip.store._read_index()) == 20
+    assert writes[mip.manifest_path] == writes[mip.store.index_path] == 1